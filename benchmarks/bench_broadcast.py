@@ -0,0 +1,192 @@
+"""
+🍑 PeachMine » Рассылка — бенчмарк пропускной способности рассылки
+
+Прогоняет настоящий путь /news → ConfirmBroadcastView → do_broadcast из
+bot.py на синтетической гильдии против фейкового Discord API
+(benchmarks/fake_discord.py) и считает сообщений/сек, задержку отправки
+(p50/p99) и пиковую память. Каждый размер запускается в отдельном
+процессе, чтобы пиковая память не смешивалась.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_broadcast.py
+    python benchmarks/bench_broadcast.py --sizes 1000 10000 --rate 500 --forbidden 0.3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+ADMIN_ID = 1
+GUILD_ID = 42
+
+
+# ─── Дочерний процесс: один прогон рассылки ──────────────────
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class FakeMessage:
+    def __init__(self, content: str = ""):
+        self.id = 1
+        self.content = content
+        self.embeds = []
+        self.attachments = []
+        self.jump_url = "https://discord.com/channels/0/0/0"
+
+    async def edit(self, **kwargs):
+        pass
+
+
+def make_guild(size: int):
+    guild = SimpleNamespace(id=GUILD_ID, members=[], _by_id={})
+    for _ in range(size):
+        user_id = random.getrandbits(60)
+        member = SimpleNamespace(id=user_id, name=f"user{user_id}", bot=False, guild=guild, roles=[])
+        guild.members.append(member)
+        guild._by_id[user_id] = member
+    guild.get_member = guild._by_id.get
+    return guild
+
+
+async def run_once(size: int) -> dict:
+    import resource
+
+    import bot
+
+    guild = make_guild(size)
+    bot.bot.get_guild = lambda guild_id: guild if guild_id == GUILD_ID else None
+    bot.member_index.rebuild(guild)
+
+    # Замер задержки каждой отправки на уровне транспорта
+    latencies = []
+    send_dm = bot.transport.send_dm
+
+    async def timed_send_dm(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await send_dm(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    bot.transport.send_dm = timed_send_dm
+
+    async def noop(*args, **kwargs):
+        return FakeMessage()
+
+    sent = {}
+
+    async def followup_send(embed=None, view=None, ephemeral=False):
+        sent["view"] = view
+
+    async def fetch_message(message_id):
+        return FakeMessage("🎉 Большое обновление сервера! " * 10)
+
+    admin = SimpleNamespace(id=ADMIN_ID, mention=f"<@{ADMIN_ID}>", send=noop)
+    ctx = SimpleNamespace(
+        author=admin, respond=noop, defer=noop,
+        followup=SimpleNamespace(send=followup_send),
+        channel=SimpleNamespace(fetch_message=fetch_message),
+        edit_original_response=noop,
+    )
+    interaction = SimpleNamespace(
+        user=admin,
+        response=SimpleNamespace(edit_message=noop, send_message=noop),
+        edit_original_response=noop,
+    )
+
+    await bot.news.callback(ctx, message_id="1", mode="send", priority="normal",
+                          start_at=None, window=None, roles=None, exclude_roles=None, role_match="any",
+                          auto_new=False)
+    view = sent["view"]
+
+    start = time.perf_counter()
+    await view.children[0].callback(interaction)  # ✅ Отправить рассылку
+    duration = time.perf_counter() - start
+    await bot.transport.close()
+
+    stats = bot.last_broadcast
+    return {
+        "size": size,
+        "success": stats["success"],
+        "failed": stats["failed"],
+        "duration": duration,
+        "rate": stats["total"] / duration if duration else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+        # ru_maxrss в Linux — в КБ
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+# ─── Родительский процесс: фейковый API и таблица ────────────
+
+async def run_suite(args):
+    from fake_discord import FakeDiscord
+
+    print(f"{'Участников':>10} {'сообщ/с':>9} {'p50, мс':>8} {'p99, мс':>8} "
+          f"{'пик RSS, МБ':>12} {'успешно':>8} {'ошибок':>7} {'время, с':>9}")
+    for size in args.sizes:
+        fake = FakeDiscord(latency=args.latency, jitter=args.jitter, forbidden_rate=args.forbidden,
+                           global_limit=args.global_limit, dm_limit=args.global_limit,
+                           message_limit=5, message_window=5.0)
+        api_base = await fake.start()
+        with tempfile.TemporaryDirectory() as data_dir:
+            env = dict(os.environ, TOKEN="fake", GUILD_ID=str(GUILD_ID), ADMIN_IDS=str(ADMIN_ID),
+                       DISCORD_API_BASE=api_base, DATA_DIR=data_dir,
+                       BROADCAST_RATE=str(args.rate), BROADCAST_CONCURRENCY=str(args.concurrency),
+                       PROGRESS_INTERVAL="1")
+            proc = await asyncio.create_subprocess_exec(
+                sys.executable, os.path.abspath(__file__), "--run", str(size),
+                cwd=ROOT, env=env, stdout=asyncio.subprocess.PIPE
+            )
+            result = None
+            async for line in proc.stdout:
+                if line.startswith(b"RESULT "):
+                    result = json.loads(line[7:])
+            await proc.wait()
+        await fake.stop()
+
+        if result is None:
+            print(f"{size:>10} — прогон завершился с ошибкой (код {proc.returncode})")
+            continue
+        print(f"{size:>10} {result['rate']:>9.1f} {result['p50'] * 1000:>8.1f} {result['p99'] * 1000:>8.1f} "
+              f"{result['peak_rss_mb']:>12.1f} {result['success']:>8} {result['failed']:>7} "
+              f"{result['duration']:>9.1f}")
+        print(f"{'':>10} API: {fake.stats}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк рассылки против фейкового Discord API")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--rate", type=float, default=1000, help="BROADCAST_RATE, сообщений/сек")
+    parser.add_argument("--concurrency", type=int, default=32, help="BROADCAST_CONCURRENCY")
+    parser.add_argument("--latency", type=float, default=0.03, help="задержка API, сек")
+    parser.add_argument("--jitter", type=float, default=0.01, help="разброс задержки, сек")
+    parser.add_argument("--forbidden", type=float, default=0.3, help="доля закрытых ЛС")
+    parser.add_argument("--global-limit", type=int, default=10_000, help="глобальный лимит API, запросов/сек")
+    parser.add_argument("--run", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        result = asyncio.run(run_once(args.run))
+        print("RESULT " + json.dumps(result), flush=True)
+    else:
+        asyncio.run(run_suite(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+"""
+🍑 PeachMine » Рассылка — бенчмарк режимов MEMBER_CACHE
+
+Сравнивает память процесса и время до готовности с кэшем участников и
+без него. С кэшем при запуске py-cord разбирает все чанки участников
+(по 1000) в объекты Member, а бот строит по ним MemberIndex — всё это
+живёт в памяти постоянно. Без кэша при запуске не разбирается ничего, а
+рассылка читает участников страницами (как fetch_members) через
+StreamedRecipients и держит только текущую страницу.
+
+Объекты настоящие — discord.Member из полезной нагрузки в формате
+шлюза; сеть не участвует, поэтому время готовности с кэшем — нижняя
+граница: в Discord к нему добавляется по запросу на каждый чанк.
+Каждый режим запускается в отдельном процессе, чтобы RSS не смешивались.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_member_cache.py [участников]
+"""
+
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+from discord.http import HTTPClient
+from discord.state import ConnectionState
+
+from utils.member_index import MemberIndex
+from utils.recipients import StreamedRecipients
+from utils.sysinfo import rss_mb
+
+# Участников в одном чанке шлюза и на одной странице fetch_members
+CHUNK = 1000
+ROLE_SHARES = {101: 0.5, 102: 0.3, 103: 0.1, 104: 0.02}
+
+
+def role_payload(role_id: int, name: str) -> dict:
+    return {"id": str(role_id), "name": name, "permissions": "0", "position": 0,
+            "color": 0, "hoist": False, "managed": False, "mentionable": False}
+
+
+def member_payloads(rng: random.Random, count: int) -> list:
+    """Участники в том виде, в каком их присылают GUILD_MEMBERS_CHUNK и /members"""
+    return [{
+        "user": {
+            "id": str(rng.getrandbits(63)), "username": f"user{rng.getrandbits(32)}",
+            "global_name": None, "discriminator": "0",
+            "avatar": f"{rng.getrandbits(128):032x}" if rng.random() < 0.7 else None,
+            "bot": rng.random() < 0.01,
+        },
+        "roles": [str(r) for r, share in ROLE_SHARES.items() if rng.random() < share],
+        "joined_at": "2024-01-01T00:00:00+00:00", "nick": None,
+        "deaf": False, "mute": False, "flags": 0,
+    } for _ in range(count)]
+
+
+def make_guild(state, size: int):
+    roles = [role_payload(1, "@everyone")] + [role_payload(r, str(r)) for r in ROLE_SHARES]
+    return discord.Guild(data={"id": "1", "name": "bench", "roles": roles, "member_count": size}, state=state)
+
+
+def chunks(size: int, seed: int = 0):
+    rng = random.Random(seed)
+    for start in range(0, size, CHUNK):
+        yield member_payloads(rng, min(CHUNK, size - start))
+
+
+async def run_on(state, size: int) -> dict:
+    """Запуск с кэшем: все чанки в guild.members, затем MemberIndex.rebuild"""
+    base = rss_mb()
+    guild = make_guild(state, size)
+    index = MemberIndex()
+    parsing = 0.0
+    for payloads in chunks(size):
+        start = time.perf_counter()
+        for data in payloads:
+            guild._add_member(discord.Member(data=data, guild=guild, state=state))
+        parsing += time.perf_counter() - start
+    start = time.perf_counter()
+    index.rebuild(guild)
+    parsing += time.perf_counter() - start
+    return {"ready": parsing, "ready_rss": rss_mb() - base, "kept": len(guild.members),
+            "recipients": index.count(guild.id)}
+
+
+async def run_off(state, size: int) -> dict:
+    """Запуск без кэша: готов сразу; рассылка читает участников страницами"""
+    base = rss_mb()
+    start = time.perf_counter()
+    guild = make_guild(state, size)
+    ready = time.perf_counter() - start
+    ready_rss = rss_mb() - base
+    parsing = 0.0
+
+    async def fetch_members():
+        nonlocal parsing
+        known = set(state._users)
+        for payloads in chunks(size):
+            start = time.perf_counter()
+            page = [discord.Member(data=data, guild=guild, state=state) for data in payloads]
+            parsing += time.perf_counter() - start
+            for member in page:
+                if not member.bot:
+                    yield member.id
+                # Как fetch_members_uncached в bot.py: иначе все User остаются в кэше состояния
+                if member.id not in known:
+                    state.deref_user(member.id)
+
+    peak = ready_rss
+    sent = 0
+    async for _ in StreamedRecipients(fetch_members, size):
+        sent += 1
+        if sent % CHUNK == 0:
+            peak = max(peak, rss_mb() - base)
+    return {"ready": ready, "ready_rss": ready_rss, "kept": len(guild.members), "users": len(state._users),
+            "recipients": sent, "stream": parsing, "stream_rss": peak, "after_rss": rss_mb() - base}
+
+
+async def measure(mode: str, size: int) -> dict:
+    state = ConnectionState(dispatch=lambda *args: None, handlers={}, hooks={}, http=HTTPClient(),
+                            loop=asyncio.get_running_loop(), intents=discord.Intents.all())
+    state._get_client = lambda: None
+    return await (run_on if mode == "on" else run_off)(state, size)
+
+
+def bench(size: int):
+    results = {}
+    for mode in ("on", "off"):
+        output = subprocess.run([sys.executable, __file__, "--mode", mode, str(size)],
+                                check=True, capture_output=True, text=True).stdout
+        results[mode] = json.loads(output)
+    on, off = results["on"], results["off"]
+
+    print(f"Участников:               {size} (чанков: {-(-size // CHUNK)})")
+    print(f"Кэш вкл, до готовности:   {on['ready']:.2f} с разбора, +{on['ready_rss']:.0f} МБ RSS "
+          f"(держится всё время, {on['kept']} Member)")
+    print(f"Кэш выкл, до готовности:  {off['ready'] * 1000:.2f} мс, +{off['ready_rss']:.1f} МБ RSS "
+          f"({off['kept']} Member)")
+    print(f"Кэш выкл, рассылка:       {off['stream']:.2f} с разбора страниц, пик +{off['stream_rss']:.1f} МБ RSS, "
+          f"после +{off['after_rss']:.1f} МБ ({off['users']} User в кэше)")
+    print(f"Получателей:              {on['recipients']} с кэшем, {off['recipients']} страницами")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--mode":
+        print(json.dumps(asyncio.run(measure(sys.argv[2], int(sys.argv[3])))))
+    else:
+        bench(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
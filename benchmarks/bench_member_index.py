@@ -0,0 +1,92 @@
+"""
+🍑 PeachMine » Рассылка — бенчмарк индекса участников
+
+Синтетическая гильдия: сравнивает полный проход по guild.members
+(как раньше в /news и /info) с подсчётом и снимком из MemberIndex, а
+фильтрацию по Member.roles — с аудиторией по индексу ролей.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_member_index.py [участников]
+"""
+
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.member_index import MemberIndex, Segment
+
+# Роли синтетической гильдии и доля участников с каждой из них
+ROLE_SHARES = {101: 0.5, 102: 0.3, 103: 0.1, 104: 0.02}
+
+
+def make_guild(size: int):
+    guild = SimpleNamespace(id=1, members=[])
+    roles = {role_id: SimpleNamespace(id=role_id) for role_id in ROLE_SHARES}
+    for _ in range(size):
+        guild.members.append(SimpleNamespace(
+            id=random.getrandbits(63), bot=random.random() < 0.01, guild=guild,
+            roles=[roles[r] for r, share in ROLE_SHARES.items() if random.random() < share]
+        ))
+    return guild
+
+
+def filter_by_roles(guild, segment: Segment) -> list:
+    """Фильтрация по Member.roles на Python — как без индекса ролей"""
+    return [m.id for m in guild.members
+            if not m.bot and segment.matches(r.id for r in m.roles)]
+
+
+def timed(func, repeat: int = 20) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat
+
+
+def bench(size: int):
+    guild = make_guild(size)
+    index = MemberIndex()
+
+    build = timed(lambda: index.rebuild(guild), repeat=3)
+
+    scan = timed(lambda: [m for m in guild.members if not m.bot])
+    count_scan = timed(lambda: len([m for m in guild.members if not m.bot]))
+    count_index = timed(lambda: index.count(guild.id), repeat=10_000)
+    snapshot = timed(lambda: index.snapshot(guild.id), repeat=10_000)
+
+    joiner = SimpleNamespace(id=random.getrandbits(63), bot=False, guild=guild, roles=[])
+    join = timed(lambda: (index.add(joiner), index.remove(joiner)), repeat=1_000) / 2
+
+    segment = Segment(include=(101, 102), exclude=(104,))
+    segment_all = Segment(include=(101, 103), match_all=True)
+    roles_scan = timed(lambda: filter_by_roles(guild, segment), repeat=3)
+    roles_index = timed(lambda: index.audience(guild.id, segment))
+    roles_all_index = timed(lambda: index.audience(guild.id, segment_all))
+    assert sorted(filter_by_roles(guild, segment)) == list(index.audience(guild.id, segment))
+
+    tracemalloc.start()
+    [m for m in guild.members if not m.bot]
+    list_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    array_bytes = index.snapshot(guild.id).buffer_info()[1] * 8
+
+    print(f"Участников:               {size}")
+    print(f"Построение индекса:       {build * 1000:.1f} мс (один раз при запуске)")
+    print(f"Список (старый /news):    {scan * 1000:.2f} мс, {list_bytes / 1024:.0f} КБ на вызов")
+    print(f"Подсчёт (старый /info):   {count_scan * 1000:.2f} мс")
+    print(f"Подсчёт из индекса:       {count_index * 1e6:.2f} мкс")
+    print(f"Снимок из индекса:        {snapshot * 1e6:.2f} мкс, без копирования")
+    print(f"Вход/выход участника:     {join * 1e6:.1f} мкс")
+    print(f"Роли по Member.roles:     {roles_scan * 1000:.1f} мс (A или B, кроме C)")
+    print(f"Роли из индекса:          {roles_index * 1000:.1f} мс (A или B, кроме C), "
+          f"{roles_all_index * 1000:.1f} мс (A и B)")
+    print(f"Размер индекса:           {array_bytes / 1024:.0f} КБ")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,73 @@
+"""
+🍑 PeachMine » Рассылка — бенчмарк подготовки сообщения
+
+Сравнивает старый путь (новый discord.Embed, strftime и JSON на каждого
+получателя) со скомпилированным сообщением, которое собирается один раз.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_payload.py [получателей]
+"""
+
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import discord
+
+from utils.payload import CompiledPayload, dumps
+
+PEACH_COLOR = 0xFF6B6B
+CONTENT = "🎉 Большое обновление сервера! " * 20
+INVITE = "https://discord.gg/peachmine"
+
+
+def per_recipient_body() -> bytes:
+    """Старый путь: всё собирается заново для каждого получателя"""
+    news_embed = discord.Embed(
+        title="🍑 PeachMine | Новости сервера",
+        description=CONTENT,
+        color=PEACH_COLOR,
+        timestamp=datetime.now()
+    )
+    news_embed.set_footer(text=f"PeachMine » Minecraft Server • {datetime.now().strftime('%d.%m.%Y')}")
+    invite_text = f"\n\n🔗 **Наш Discord:** {INVITE}"
+    news_embed.description = CONTENT + invite_text
+    return dumps({"embeds": [news_embed.to_dict()]})
+
+
+def compile_once() -> CompiledPayload:
+    now = datetime.now()
+    news_embed = discord.Embed(
+        title="🍑 PeachMine | Новости сервера",
+        description=CONTENT + f"\n\n🔗 **Наш Discord:** {INVITE}",
+        color=PEACH_COLOR,
+        timestamp=now
+    )
+    news_embed.set_footer(text=f"PeachMine » Minecraft Server • {now.strftime('%d.%m.%Y')}")
+    return CompiledPayload({"embeds": [news_embed.to_dict()]})
+
+
+def bench(recipients: int):
+    start = time.perf_counter()
+    for _ in range(recipients):
+        body = per_recipient_body()
+    old = time.perf_counter() - start
+
+    start = time.perf_counter()
+    payload = compile_once()
+    for _ in range(recipients):
+        body = payload.body
+    new = time.perf_counter() - start
+
+    print(f"Получателей:        {recipients}")
+    print(f"Размер тела:        {len(body)} байт")
+    print(f"На каждого:         {old * 1000:.1f} мс ({old / recipients * 1e6:.2f} мкс/получатель)")
+    print(f"Скомпилировано:     {new * 1000:.3f} мс ({new / recipients * 1e6:.3f} мкс/получатель)")
+    print(f"Ускорение:          x{old / new:.0f}")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,90 @@
+"""
+🍑 PeachMine » Рассылка — бенчмарк памяти списка получателей
+
+Сравнивает, сколько памяти держит рассылка на N получателей: список
+объектов участников (как раньше: окно подтверждения, ID для журнала и
+очередь диспетчера, заполненная целиком) против RecipientList — ID в
+array('Q') с байтом статуса и очередью, которая подаётся по индексам.
+Отправка мгновенная, поэтому считается только память самой рассылки.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_recipients.py [получателей]
+"""
+
+import asyncio
+import os
+import random
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.dispatcher import BroadcastDispatcher
+from utils.recipients import RecipientList
+
+
+class InstantResponse:
+    status = 200
+    ok = True
+    remaining = None
+    reset_after = None
+
+
+RESPONSE = InstantResponse()
+
+
+async def send(recipient):
+    return RESPONSE
+
+
+async def old_pipeline(members: list):
+    """Список участников в окне, копия ID для журнала и очередь на всех сразу"""
+    recipients = list(members)
+    journal_ids = [m.id for m in recipients]
+
+    async def send_member(member):
+        return await send(member.id)
+
+    dispatcher = BroadcastDispatcher(send_member, concurrency=4, rate=1e9, track_metrics=False)
+    await dispatcher.run(recipients)
+    return journal_ids
+
+
+async def new_pipeline(members: list):
+    """RecipientList: 8 байт ID + 1 байт статуса, очередь ограничена backlog"""
+    recipients = RecipientList(m.id for m in members)
+    dispatcher = BroadcastDispatcher(send, concurrency=4, rate=1e9, track_metrics=False)
+    await dispatcher.run(recipients)
+    return recipients
+
+
+def measure(pipeline, members: list) -> tuple:
+    tracemalloc.start()
+    start = time.perf_counter()
+    asyncio.run(pipeline(members))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, elapsed
+
+
+def bench(size: int):
+    # Объекты участников живут в кэше discord.py и в замер не входят
+    members = [SimpleNamespace(id=random.getrandbits(60), bot=False) for _ in range(size)]
+
+    old_peak, old_time = measure(old_pipeline, members)
+    new_peak, new_time = measure(new_pipeline, members)
+    held = RecipientList(m.id for m in members).nbytes
+
+    print(f"Получателей:              {size}")
+    print(f"Список участников:        пик {old_peak / 1024 / 1024:.1f} МБ, {old_time:.2f} с")
+    print(f"RecipientList:            пик {new_peak / 1024 / 1024:.1f} МБ, {new_time:.2f} с")
+    print(f"Сэкономлено:              {(old_peak - new_peak) / 1024 / 1024:.1f} МБ "
+          f"({old_peak / max(new_peak, 1):.1f}x)")
+    print(f"Держит окно подтверждения: {held / 1024:.0f} КБ (ID + статусы)")
+
+
+if __name__ == "__main__":
+    bench(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
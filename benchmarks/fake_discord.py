@@ -0,0 +1,201 @@
+"""
+🍑 PeachMine » Рассылка — локальный фейковый Discord API
+
+aiohttp-сервер, который отвечает на запросы рассылки как Discord:
+открытие ЛС, отправка сообщений, 429 с retry_after (лимиты маршрута и
+глобальный), 403 для части получателей и задержка с разбросом.
+Ничего никуда не отправляет — можно гонять рассылки без реальных людей.
+
+Запуск отдельно (бот направляется через DISCORD_API_BASE):
+    python benchmarks/fake_discord.py --port 8080 --forbidden 0.3
+    DISCORD_API_BASE=http://127.0.0.1:8080/api/v10 python bot.py
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import deque
+
+from aiohttp import web
+
+API_PREFIX = "/api/v10"
+
+
+class SlidingLimit:
+    """Лимит «не больше N запросов за окно» как у бакетов Discord"""
+
+    def __init__(self, limit: int, window: float):
+        self.limit = limit
+        self.window = window
+        self._hits = deque()
+
+    def hit(self, now: float):
+        """Возвращает (осталось, сброс_через) или None, если лимит превышен"""
+        while self._hits and now - self._hits[0] >= self.window:
+            self._hits.popleft()
+        if len(self._hits) >= self.limit:
+            return None
+        self._hits.append(now)
+        reset_after = self.window - (now - self._hits[0])
+        return self.limit - len(self._hits), reset_after
+
+    def retry_after(self, now: float) -> float:
+        return max(0.0, self.window - (now - self._hits[0]))
+
+
+class FakeDiscord:
+    """Состояние и обработчики фейкового API"""
+
+    def __init__(self, *, latency: float = 0.05, jitter: float = 0.02,
+                 forbidden_rate: float = 0.0, error_rate: float = 0.0,
+                 global_limit: int = 50, dm_limit: int = 100, dm_window: float = 1.0,
+                 message_limit: int = 5, message_window: float = 5.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.forbidden_rate = forbidden_rate
+        self.error_rate = error_rate
+        self.message_limit = message_limit
+        self.message_window = message_window
+        self.global_bucket = SlidingLimit(global_limit, 1.0)
+        self.dm_bucket = SlidingLimit(dm_limit, dm_window)
+        self.channel_buckets = {}
+        self.random = random.Random(seed)
+        self.stats = {"dm_created": 0, "messages": 0, "uploads": 0, "upload_bytes": 0,
+                      "forbidden": 0, "errors": 0, "rate_limited": 0, "global_limited": 0,
+                      "edits": 0}
+
+    def is_forbidden(self, user_id: int) -> bool:
+        # Детерминированно по ID: повторная рассылка видит тех же «закрытых»
+        return (user_id * 2654435761 % 2**32) / 2**32 < self.forbidden_rate
+
+    async def _delay(self):
+        await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+    def _limited(self, bucket: SlidingLimit, name: str, now: float, is_global: bool = False):
+        retry_after = round(bucket.retry_after(now), 3)
+        self.stats["global_limited" if is_global else "rate_limited"] += 1
+        headers = {"Retry-After": str(max(1, int(retry_after + 0.999))), "Via": "1.1 google",
+                   "X-RateLimit-Scope": "global" if is_global else "user"}
+        if is_global:
+            headers["X-RateLimit-Global"] = "true"
+        else:
+            headers.update({"X-RateLimit-Limit": str(bucket.limit), "X-RateLimit-Remaining": "0",
+                            "X-RateLimit-Reset-After": str(retry_after), "X-RateLimit-Bucket": name})
+        return web.json_response(
+            {"message": "You are being rate limited.", "retry_after": retry_after, "global": is_global},
+            status=429, headers=headers
+        )
+
+    def _check(self, bucket: SlidingLimit, name: str):
+        """Проверяет глобальный лимит и лимит маршрута; возвращает 429 или заголовки"""
+        now = time.monotonic()
+        if self.global_bucket.hit(now) is None:
+            return self._limited(self.global_bucket, "global", now, is_global=True), None
+        state = bucket.hit(now)
+        if state is None:
+            return self._limited(bucket, name, now), None
+        remaining, reset_after = state
+        return None, {"X-RateLimit-Limit": str(bucket.limit), "X-RateLimit-Remaining": str(remaining),
+                      "X-RateLimit-Reset-After": f"{reset_after:.3f}", "X-RateLimit-Bucket": name}
+
+    async def create_dm(self, request: web.Request):
+        await self._delay()
+        limited, headers = self._check(self.dm_bucket, "dm")
+        if limited:
+            return limited
+        body = await request.json()
+        user_id = int(body["recipient_id"])
+        self.stats["dm_created"] += 1
+        # ID канала выводим из ID пользователя — так его можно «узнать» обратно
+        return web.json_response({"id": str(user_id + 1), "type": 1,
+                                  "recipients": [{"id": str(user_id)}]}, headers=headers)
+
+    async def create_message(self, request: web.Request):
+        await self._delay()
+        channel_id = int(request.match_info["channel_id"])
+        bucket = self.channel_buckets.get(channel_id)
+        if bucket is None:
+            bucket = self.channel_buckets[channel_id] = SlidingLimit(self.message_limit, self.message_window)
+        limited, headers = self._check(bucket, f"channel:{channel_id}")
+        if limited:
+            return limited
+
+        attachments = []
+        if request.content_type.startswith("multipart/"):
+            form = await request.post()
+            for name, field in form.items():
+                if name.startswith("files["):
+                    data = field.file.read()
+                    self.stats["uploads"] += 1
+                    self.stats["upload_bytes"] += len(data)
+                    attachments.append({
+                        "id": str(len(attachments) + 1), "filename": field.filename, "size": len(data),
+                        "url": f"https://cdn.example/{channel_id}/{field.filename}",
+                        "content_type": field.content_type,
+                    })
+        else:
+            await request.read()
+
+        if self.is_forbidden(channel_id - 1):
+            self.stats["forbidden"] += 1
+            return web.json_response({"message": "Cannot send messages to this user", "code": 50007},
+                                     status=403, headers=headers)
+        if self.random.random() < self.error_rate:
+            self.stats["errors"] += 1
+            return web.json_response({"message": "Internal Server Error", "code": 0}, status=500)
+
+        self.stats["messages"] += 1
+        return web.json_response({"id": str(self.stats["messages"]), "channel_id": str(channel_id),
+                                  "attachments": attachments}, headers=headers)
+
+    async def edit_message(self, request: web.Request):
+        await self._delay()
+        await request.read()
+        self.stats["edits"] += 1
+        return web.json_response({"id": request.match_info["message_id"]})
+
+    async def gateway(self, request: web.Request):
+        return web.json_response({"url": "wss://gateway.invalid", "shards": 1,
+                                  "session_start_limit": {"total": 1000, "remaining": 1000,
+                                                          "reset_after": 0, "max_concurrency": 1}})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post(API_PREFIX + "/users/@me/channels", self.create_dm)
+        app.router.add_post(API_PREFIX + "/channels/{channel_id}/messages", self.create_message)
+        app.router.add_patch(API_PREFIX + "/channels/{channel_id}/messages/{message_id}", self.edit_message)
+        app.router.add_get(API_PREFIX + "/gateway/bot", self.gateway)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запускает сервер и возвращает базовый URL API"""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Фейковый Discord API для рассылки")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.05, help="задержка ответа, сек")
+    parser.add_argument("--jitter", type=float, default=0.02, help="разброс задержки, сек")
+    parser.add_argument("--forbidden", type=float, default=0.3, help="доля закрытых ЛС")
+    parser.add_argument("--errors", type=float, default=0.0, help="доля ответов 500")
+    parser.add_argument("--global-limit", type=int, default=50, help="глобальный лимит, запросов/сек")
+    args = parser.parse_args()
+
+    fake = FakeDiscord(latency=args.latency, jitter=args.jitter, forbidden_rate=args.forbidden,
+                       error_rate=args.errors, global_limit=args.global_limit)
+    print(f"🍑 Фейковый Discord API: http://127.0.0.1:{args.port}{API_PREFIX}")
+    web.run_app(fake.app(), host="127.0.0.1", port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
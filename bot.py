@@ -5,6 +5,7 @@ Discord бот для массовой рассылки новостей с кр
 
 import asyncio
 import os
+import re
 import sys
 import subprocess
 
@@ -15,14 +16,45 @@ if sys.platform == "win32":
 import discord
 from discord.ext import commands
 from discord.ui import View, Button
-import io
-from datetime import datetime
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 from dotenv import load_dotenv
 
+from utils import metrics
+from utils.attachments import SKIP_TOO_LARGE, prefetch, spool_bytes
+from utils.dispatcher import OUTCOME_DEAD_LETTER, OUTCOME_OK
+from utils.dm_cache import DMChannelCache
+from utils.fanout import AttachmentFanout, FANOUT_MODES, FANOUT_OFF, reference_problems
+from utils.journal import BroadcastJournal, STATUS_ERROR, STATUS_TRANSIENT
+from utils.ledger import DeliveredSet, DeliveryLedger
+from utils.limits import EMBED_DESCRIPTION_LIMIT, split_text, validate
+from utils.log import BroadcastLog, logger
+from utils.member_index import MemberIndex, Segment
+from utils.outcomes import OutcomeStore
+from utils.payload import CompiledPayload
+from utils.payload_cache import PayloadCache, content_key
+from utils.progress import ProgressReporter, StatusPublisher
+from utils.recipients import RecipientList, StreamedRecipients
+from utils.simulation import simulate
+from utils.scheduler import (BroadcastScheduler, JOB_CANCELLED, JOB_PAUSED, JOB_RUNNING,
+                             JOB_SCHEDULED, PRIORITY_NORMAL, PRIORITY_URGENT)
+from utils.suppression import SuppressionList
+from utils.sysinfo import rss_mb
+from utils.transport import DiscordTransport, DEFAULT_API_BASE
+
 load_dotenv()
 
+# Время запуска процесса — для замера времени до готовности
+PROCESS_STARTED = time.monotonic()
+
 TOKEN = os.getenv("TOKEN")
-GUILD_ID = int(os.getenv("GUILD_ID")) if os.getenv("GUILD_ID") else None
+
+# Серверы рассылки из GUILD_IDS (через запятую); первый — главный
+guild_ids_str = os.getenv("GUILD_IDS", os.getenv("GUILD_ID", ""))
+GUILD_IDS = list(dict.fromkeys(int(id.strip()) for id in guild_ids_str.split(",") if id.strip()))
+GUILD_ID = GUILD_IDS[0] if GUILD_IDS else None
 
 # Парсим список админов из переменной ADMIN_IDS (через запятую)
 admin_ids_str = os.getenv("ADMIN_IDS", os.getenv("ADMIN_ID", ""))
@@ -30,6 +62,56 @@ ADMIN_IDS = [int(id.strip()) for id in admin_ids_str.split(",") if id.strip()]
 
 DISCORD_INVITE = os.getenv("DISCORD_INVITE", "https://discord.gg/peachmine")
 
+# Настройки рассылки: число параллельных отправителей и целевая скорость (сообщений/сек)
+BROADCAST_CONCURRENCY = int(os.getenv("BROADCAST_CONCURRENCY", "4"))
+BROADCAST_RATE = float(os.getenv("BROADCAST_RATE", "2"))
+DISCORD_API_BASE = os.getenv("DISCORD_API_BASE", DEFAULT_API_BASE)
+
+# Как часто (сек) обновлять прогресс рассылки
+PROGRESS_INTERVAL = float(os.getenv("PROGRESS_INTERVAL", "5"))
+
+# Долгие рассылки переживают 15-минутный токен интеракции: статус ведётся
+# в постоянном сообщении — в канале STATUS_CHANNEL_ID или в ЛС админу
+STATUS_CHANNEL_ID = int(os.getenv("STATUS_CHANNEL_ID")) if os.getenv("STATUS_CHANNEL_ID") else None
+LONG_BROADCAST_SECONDS = 10 * 60
+
+# Вложения: off — грузить в каждое ЛС, first — загрузить с первым ЛС и дальше
+# слать ссылки, staging — загрузить в служебный канал STAGING_CHANNEL_ID
+ATTACHMENT_FANOUT = os.getenv("ATTACHMENT_FANOUT", FANOUT_OFF).lower()
+if ATTACHMENT_FANOUT not in FANOUT_MODES:
+    ATTACHMENT_FANOUT = FANOUT_OFF
+STAGING_CHANNEL_ID = int(os.getenv("STAGING_CHANNEL_ID")) if os.getenv("STAGING_CHANNEL_ID") else None
+# Вложения крупнее не рассылаются (лимит загрузки Discord без бустов — 10 МБ)
+ATTACHMENT_MAX_BYTES = int(float(os.getenv("ATTACHMENT_MAX_MB", "10")) * 1024 * 1024)
+# Кэш скачанных вложений и подготовленных сообщений для повторных /news (крупные файлы — на диске)
+PAYLOAD_CACHE_BYTES = int(float(os.getenv("PAYLOAD_CACHE_MB", "256")) * 1024 * 1024)
+
+# Кэш участников: on — все участники в памяти (индекс, быстрый /news),
+# off — без кэша, получатели подгружаются страницами во время рассылки
+MEMBER_CACHE = os.getenv("MEMBER_CACHE", "on").lower() not in ("off", "0", "false", "no")
+
+# Досылка новым участникам: вошедшие за это время (сек) получают сообщение одной пачкой
+AUTO_DELIVERY_BATCH_SECONDS = float(os.getenv("AUTO_DELIVERY_BATCH_SECONDS", "10"))
+
+# Через сколько дней перепроверять участников с закрытыми ЛС (0 — не пропускать)
+SUPPRESSION_TTL_DAYS = float(os.getenv("SUPPRESSION_TTL_DAYS", "14"))
+
+# Сколько дней журнал хранит вложения завершённых рассылок (для /broadcast replay);
+# 0 — удалять сразу. Пока включена досылка новым участникам, вложения не удаляются
+BROADCAST_FILES_DAYS = float(os.getenv("BROADCAST_FILES_DAYS", "7"))
+
+# Папка для журнала рассылок (на Railway — подключённый Volume)
+DATA_DIR = os.getenv("DATA_DIR", "data")
+
+# Часовой пояс для времени старта запланированных рассылок (/news start_at)
+try:
+    BROADCAST_TZ = ZoneInfo(os.getenv("TIMEZONE", "Europe/Moscow"))
+except (ZoneInfoNotFoundError, ValueError):
+    BROADCAST_TZ = timezone.utc
+
+# Порт HTTP-эндпоинта /metrics для Prometheus (не задан — эндпоинт выключен)
+METRICS_PORT = int(os.getenv("METRICS_PORT")) if os.getenv("METRICS_PORT") else None
+
 # Флаг для перезапуска
 RESTART_FLAG = False
 
@@ -53,11 +135,60 @@ intents = discord.Intents.default()
 intents.members = True
 intents.message_content = True
 
-bot = commands.Bot(intents=intents)
+if MEMBER_CACHE:
+    bot = commands.Bot(intents=intents)
+else:
+    # Интент участников нужен для fetch_members, но в памяти их не держим
+    bot = commands.Bot(
+        intents=intents,
+        member_cache_flags=discord.MemberCacheFlags.none(),
+        chunk_guilds_at_startup=False
+    )
+
+# Кэш ID ЛС-каналов: отправка — один POST без предварительного открытия ЛС
+dm_channels = DMChannelCache(os.path.join(DATA_DIR, "dm_channels.db"))
+
+# Участники с закрытыми ЛС — не тратим на них запросы до истечения TTL
+closed_dms = SuppressionList(os.path.join(DATA_DIR, "closed_dms.db"), SUPPRESSION_TTL_DAYS * 86400)
+
+# HTTP-транспорт для ЛС (свой, чтобы видеть заголовки лимитов)
+transport = DiscordTransport(TOKEN, DISCORD_API_BASE, max_connections=BROADCAST_CONCURRENCY * 2,
+                             dm_channels=dm_channels)
+
+# Журнал рассылок — переживает редеплой и позволяет продолжить рассылку
+journal = BroadcastJournal(os.path.join(DATA_DIR, "journal.db"))
+
+# Итоги рассылок по байту на получателя — по ним /broadcast replay выбирает, кому переотправить
+outcome_store = OutcomeStore(os.path.join(DATA_DIR, "outcomes"))
+
+# Кому какое сообщение уже доставлено — для дельта-рассылок и досылки новым участникам
+ledger = DeliveryLedger(journal)
+
+# Индекс участников-людей: поддерживается событиями, а не пересканированием guild.members
+member_index = MemberIndex()
+
+# Повторный /news по тому же сообщению не качает вложения заново
+payload_cache = PayloadCache(PAYLOAD_CACHE_BYTES)
+
+# Все рассылки делят один лимит BROADCAST_RATE — одновременные не удваивают нагрузку на токен
+scheduler = BroadcastScheduler(BROADCAST_RATE, BROADCAST_CONCURRENCY)
 
 # Статистика
 last_broadcast = {"success": 0, "failed": 0, "total": 0, "timestamp": None}
 start_time = None
+ready_seconds = None
+metrics_runner = None
+
+# Досылка новым участникам: {ID рассылки: ID сообщения} и вошедшие с ролями на момент входа
+auto_deliveries = {}
+joined_members = {}
+auto_delivery_task = None
+
+# Метрики, которые считаются в момент запроса /metrics
+metrics.registry.register(metrics.Gauge(
+    "peachmine_gateway_latency_seconds", "Задержка gateway Discord", func=lambda: bot.latency))
+metrics.registry.register(metrics.Gauge(
+    "peachmine_member_cache_size", "Участников-людей в индексе", func=lambda: sum(member_index.count(gid) for gid in GUILD_IDS)))
 
 
 # ═══════════════════════════════════════════════════════════
@@ -87,6 +218,279 @@ def create_success_embed(message: str) -> discord.Embed:
     return create_embed("Успешно", f"✅ {message}", SUCCESS_COLOR)
 
 
+def create_progress_embed(progress: dict, state: str = None, broadcast_id: int = None) -> discord.Embed:
+    """Embed прогресса рассылки: счётчики, скорость и оставшееся время"""
+    eta = format_duration(progress["eta"]) if progress["eta"] is not None else "—"
+    if state == JOB_PAUSED:
+        headline = "⏸️ **На паузе**"
+    elif state == JOB_CANCELLED:
+        headline = "🛑 **Отменяется...**"
+    else:
+        headline = "📤 **Отправка...**"
+    return create_embed(
+        "Рассылка",
+        f"{headline}\n\n"
+        f"✅ Успешно: **{progress['success']}**\n"
+        f"❌ Ошибок: **{progress['failed']}**\n"
+        f"⏳ Прогресс: `{progress['processed']}/{progress['total']}`\n"
+        f"🚀 Скорость: **{progress['rate']:.1f}** сообщ./с\n"
+        f"⏱️ Осталось: **{eta}**"
+        + (f"\n\n🆔 Рассылка **#{broadcast_id}** · пауза и отмена: `/broadcast`" if broadcast_id is not None else ""),
+        WARNING_COLOR
+    )
+
+
+def format_duration(seconds: float) -> str:
+    """Длительность в читаемом формате"""
+    hours, remainder = divmod(int(seconds), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}ч {minutes}м {seconds}с"
+
+
+def format_size(size: int) -> str:
+    """Размер в байтах в читаемом формате"""
+    for unit in ("Б", "КБ", "МБ"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ГБ"
+
+
+def compile_broadcast(message_data: dict) -> CompiledPayload:
+    """Собирает итоговое сообщение рассылки один раз для всех получателей"""
+    content = message_data.get("content")
+    embeds = message_data.get("embeds", [])
+    
+    # Добавляем инвайт в конце
+    invite_text = f"\n\n🔗 **Наш Discord:** {DISCORD_INVITE}"
+    
+    # Если есть оригинальные embeds - шлём их, иначе наш красивый
+    if embeds:
+        final_content = (content + invite_text) if content else invite_text
+        data = {"content": final_content, "embeds": [e.to_dict() for e in embeds]}
+    else:
+        # Текст длиннее описания embed'а — продолжаем в следующих embed'ах того же сообщения
+        now = datetime.now()
+        parts = split_text((content or "") + invite_text, EMBED_DESCRIPTION_LIMIT)
+        news_embeds = [discord.Embed(description=part, color=PEACH_COLOR) for part in parts]
+        news_embeds[0].title = f"{PEACH_EMOJI} PeachMine | Новости сервера"
+        news_embeds[-1].timestamp = now
+        news_embeds[-1].set_footer(text=f"PeachMine » Minecraft Server • {now.strftime('%d.%m.%Y')}")
+        data = {"embeds": [e.to_dict() for e in news_embeds]}
+    
+    return CompiledPayload(data, message_data.get("files", []))
+
+
+def message_data_from_record(record: dict) -> dict:
+    """Данные сообщения рассылки из записи журнала; файлы забираются из записи и уходят в mmap"""
+    return {
+        "content": record["content"],
+        "embeds": [discord.Embed.from_dict(e) for e in record["embeds"]],
+        "files": [(name, spool_bytes(data)) for name, data in record.pop("files")],
+        "source_url": record["source_url"],
+        "message_id": record["message_id"]
+    }
+
+
+def broadcast_title(message_data: dict) -> str:
+    return (message_data.get("content") or "Embed")[:60]
+
+
+def parse_start_time(text: str) -> float:
+    """«ЧЧ:ММ», «ДД.ММ ЧЧ:ММ» или «ДД.ММ.ГГГГ ЧЧ:ММ» в BROADCAST_TZ → unix-время"""
+    now = datetime.now(BROADCAST_TZ)
+    text = text.strip()
+    for fmt in ("%d.%m.%Y %H:%M", "%d.%m %H:%M", "%H:%M"):
+        try:
+            parsed = datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+        if fmt == "%H:%M":
+            # Время без даты — ближайшее такое время, сегодня или завтра
+            moment = now.replace(hour=parsed.hour, minute=parsed.minute, second=0, microsecond=0)
+            if moment <= now:
+                moment += timedelta(days=1)
+        elif fmt == "%d.%m %H:%M":
+            moment = parsed.replace(year=now.year, tzinfo=BROADCAST_TZ)
+            if moment < now:
+                moment = moment.replace(year=now.year + 1)
+        else:
+            moment = parsed.replace(tzinfo=BROADCAST_TZ)
+        return moment.timestamp()
+    raise ValueError(text)
+
+
+def broadcast_pace(total: int, window: float = None):
+    """Темп рассылки с окном доставки, сообщений/сек (None — как позволяет общий лимит)"""
+    if not window or total <= 0:
+        return None
+    return total / window
+
+
+def expected_duration(total: int, window: float = None) -> float:
+    return max(total / BROADCAST_RATE, window or 0)
+
+
+async def post_status_message(user, total: int):
+    """Постоянное сообщение со статусом долгой рассылки: в канал админов или в ЛС запустившему"""
+    start_embed = create_embed(
+        "Рассылка",
+        f"📤 **Отправка началась...**\n\n"
+        f"👥 Получателей: **{total}**\n"
+        f"👤 Запустил: {user.mention}",
+        WARNING_COLOR
+    )
+    try:
+        if STATUS_CHANNEL_ID:
+            channel = bot.get_channel(STATUS_CHANNEL_ID) or await bot.fetch_channel(STATUS_CHANNEL_ID)
+        else:
+            channel = user
+        return await channel.send(embed=start_embed)
+    except Exception as e:
+        logger.warning("broadcast.status_message_failed", error=str(e))
+        return None
+
+
+async def run_broadcast(broadcast_id: int, payload: CompiledPayload, recipients, status: StatusPublisher, *,
+                        priority: str, owner_id: int, title: str, window: float = None,
+                        replay: bool = False, files_key: tuple = None, message_id: int = None,
+                        followup: bool = False) -> dict:
+    """
+    Рассылка через общий планировщик: журнал, прогресс и итоги в `status`.
+    `replay` — повторная отправка из dead letter: кто получил итог, из него убирается.
+    `files_key` — ID вложений: по ним берутся ссылки, загруженные прошлой рассылкой.
+    `message_id` — исходное сообщение: успешные доставки попадают в ledger.
+    `followup` — досылка новым участникам: «последнюю рассылку» в /info не трогает.
+    """
+    global last_broadcast
+    
+    total = len(recipients)
+    
+    # Вложения загружаются один раз, дальше рассылаются ссылки (если включено)
+    fanout = AttachmentFanout(transport, ATTACHMENT_FANOUT, STAGING_CHANNEL_ID)
+    upload = payload_cache.get_upload(files_key, fanout.ttl) if files_key else None
+    if upload is not None:
+        fanout.seed(*upload, payload)
+    
+    pace = broadcast_pace(total, window)
+    logger.info("broadcast.started", broadcast=broadcast_id, recipients=total,
+                concurrency=BROADCAST_CONCURRENCY, rate=BROADCAST_RATE, priority=priority,
+                window=window, pace=pace, admin=owner_id)
+    
+    # Не строка на получателя, а сводка раз в секунду и выборка ошибок
+    broadcast_log = BroadcastLog(logger, broadcast_id)
+    
+    # Получатель — просто ID: ЛС открывается по нему в момент отправки
+    async def send(user_id):
+        return await fanout.send_dm(user_id, payload)
+    
+    resolved = []
+    
+    async def on_result(user_id, outcome, detail):
+        journal.record(broadcast_id, user_id, outcome)
+        if outcome == OUTCOME_OK and message_id:
+            ledger.add(message_id, user_id)
+        if outcome == OUTCOME_DEAD_LETTER:
+            journal.dead_letter(broadcast_id, user_id, detail)
+        elif replay:
+            resolved.append(user_id)
+        closed_dms.record(user_id, outcome)
+        broadcast_log.record(outcome, user_id, detail)
+    
+    # Рассылка встаёт в общий планировщик: скорость делится с другими рассылками,
+    # а с окном доставки она ещё и идёт равномерно, не быстрее total / window
+    job = scheduler.create(
+        broadcast_id, send,
+        priority=priority,
+        on_result=on_result,
+        title=title,
+        owner_id=owner_id,
+        pace=pace
+    )
+    
+    def render(snapshot):
+        return create_progress_embed(snapshot, job.state, job.id)
+    
+    # Прогресс обновляется отдельной задачей и не тормозит отправку
+    reporter = ProgressReporter(job.stats, render, status.publish, PROGRESS_INTERVAL, expected=total)
+    
+    async def notify():
+        await status.publish(render(reporter.snapshot()))
+    
+    job.notify = notify
+    reporter.start()
+    try:
+        stats = await scheduler.run(job, recipients)
+    finally:
+        snapshot = await reporter.stop()
+    success = stats["success"]
+    failed = stats["failed"]
+    dead = stats["dead_letter"]
+    total = stats["total"]
+    cancelled = job.state == JOB_CANCELLED
+    await journal.finish(broadcast_id, JOB_CANCELLED if cancelled else "done")
+    if files_key and fanout.references is not None:
+        payload_cache.put_upload(files_key, fanout.references, fanout.uploaded_at)
+    if resolved:
+        await journal.resolve_dead_letters(broadcast_id, resolved)
+    await save_outcomes(broadcast_id)
+    await purge_broadcast_files()
+    
+    # Сохраняем статистику
+    if not followup:
+        last_broadcast = {
+            "success": success,
+            "failed": failed,
+            "total": total,
+            "timestamp": datetime.now()
+        }
+    
+    # Финальный embed
+    final_embed = create_embed(
+        "Рассылка отменена" if cancelled else "Рассылка завершена",
+        f"📊 **Результаты:**\n\n"
+        f"✅ Успешно отправлено: **{success}**\n"
+        f"❌ Не удалось отправить: **{failed}**\n"
+        f"👥 Всего участников: **{total}**\n"
+        + (f"🛑 Не отправлено из-за отмены: **{total - success - failed}**\n" if cancelled else "")
+        + (f"📮 Сбои Discord, повторы исчерпаны: **{dead}** — "
+           f"`/broadcast replay broadcast_id:{broadcast_id}`\n" if dead else "")
+        + f"\n📈 Успешность: **{round(success/total*100, 1) if total else 0}%**\n"
+        f"⏱️ Время: **{format_duration(snapshot['elapsed'])}**",
+        ERROR_COLOR if cancelled else SUCCESS_COLOR if failed == 0 else WARNING_COLOR
+    )
+    
+    try:
+        await status.publish(final_embed)
+    except Exception as e:
+        logger.warning("broadcast.status_failed", broadcast=broadcast_id, error=str(e))
+    broadcast_log.close(success=success, failed=failed, total=total, cancelled=cancelled,
+                        retried=stats["retried"], dead_letter=dead,
+                        seconds=round(snapshot["elapsed"], 1),
+                        upload_bytes=fanout.uploaded_bytes, fanout=fanout.mode)
+    return stats
+
+
+async def purge_broadcast_files():
+    """Вложения завершённых рассылок старше BROADCAST_FILES_DAYS — из журнала долой"""
+    try:
+        purged = await journal.purge_files(time.time() - BROADCAST_FILES_DAYS * 86400)
+    except Exception as e:
+        logger.warning("broadcast.files_purge_failed", error=str(e))
+        return
+    if purged:
+        logger.info("broadcast.files_purged", broadcasts=purged, days=BROADCAST_FILES_DAYS)
+
+
+async def save_outcomes(broadcast_id: int):
+    """Итог рассылки из журнала — в файл итогов (целиком, с досылками и повторами)"""
+    try:
+        ids, status = await journal.outcomes(broadcast_id)
+        await asyncio.to_thread(outcome_store.write, broadcast_id, ids, status)
+    except Exception as e:
+        logger.warning("broadcast.outcomes_failed", broadcast=broadcast_id, error=str(e))
+
+
 # ═══════════════════════════════════════════════════════════
 # 🔘 КНОПКИ ПОДТВЕРЖДЕНИЯ
 # ═══════════════════════════════════════════════════════════
@@ -94,12 +498,28 @@ def create_success_embed(message: str) -> discord.Embed:
 class ConfirmBroadcastView(View):
     """View с кнопками подтверждения рассылки"""
     
-    def __init__(self, message_data: dict, members: list, original_interaction, ref_message):
+    def __init__(self, message_data: dict, recipients, original_interaction, ref_message,
+                 broadcast_id: int = None, priority: str = PRIORITY_NORMAL,
+                 start_at: float = None, window: float = None, segment: Segment = None,
+                 auto_new: bool = False):
         super().__init__(timeout=120)
         self.message_data = message_data
-        self.members = members
+        # RecipientList (ID + статусы) или StreamedRecipients — объекты участников не держим
+        self.recipients = recipients
         self.original_interaction = original_interaction
         self.ref_message = ref_message
+        # ID в журнале: задан заранее, если продолжаем прерванную рассылку
+        self.broadcast_id = broadcast_id
+        self.priority = priority
+        # Отложенный старт (unix-время) и окно доставки (сек)
+        self.start_at = start_at
+        self.window = window
+        # Фильтр по ролям — нужен запланированной рассылке, чтобы собрать получателей при старте
+        self.segment = segment or Segment()
+        # Досылать сообщение тем, кто войдёт на сервер после рассылки
+        self.auto_new = auto_new
+        self.payload = None
+        self.prewarm_task = None
         self.confirmed = False
     
     @discord.ui.button(label="✅ Отправить рассылку", style=discord.ButtonStyle.success)
@@ -114,14 +534,44 @@ class ConfirmBroadcastView(View):
         self.confirmed = True
         self.disable_all_items()
         
+        if self.start_at is not None and self.start_at > time.time():
+            await interaction.response.defer()
+            await self.stop_prewarm()
+            await self.schedule_broadcast(interaction)
+            return
+        
         progress_embed = create_embed(
             "Рассылка",
             f"📤 **Отправка началась...**\n\n"
-            f"👥 Получателей: **{len(self.members)}**\n"
-            f"⏳ Прогресс: `0/{len(self.members)}`",
+            f"👥 Получателей: **{len(self.recipients)}**\n"
+            f"⏳ Прогресс: `0/{len(self.recipients)}`",
             WARNING_COLOR
         )
         await interaction.response.edit_message(embed=progress_embed, view=self)
+        
+        # Сообщение одинаково для всех — собираем и сериализуем его один раз
+        self.payload = compile_broadcast(self.message_data)
+        
+        # Дальше ЛС открывает сама рассылка — прогрев больше не нужен
+        await self.stop_prewarm()
+        
+        if self.broadcast_id is None:
+            # Потоковых получателей журнал узнаёт по мере отправки
+            streamed = isinstance(self.recipients, StreamedRecipients)
+            self.broadcast_id = await journal.start(
+                self.message_data.get("content"),
+                [e.to_dict() for e in self.message_data.get("embeds", [])],
+                self.message_data.get("files", []),
+                [] if streamed else self.recipients.ids,
+                self.ref_message.jump_url if self.ref_message else None,
+                total=len(self.recipients),
+                priority=self.priority,
+                owner_id=interaction.user.id,
+                segment=self.segment.to_dict() if self.segment else None,
+                message_id=self.message_data.get("message_id")
+            )
+        if self.auto_new:
+            await enable_auto_delivery(self.broadcast_id, self.message_data.get("message_id"))
         await self.do_broadcast(interaction)
     
     @discord.ui.button(label="✏️ Редактировать", style=discord.ButtonStyle.primary)
@@ -134,10 +584,11 @@ class ConfirmBroadcastView(View):
             return
         
         # Отправляем ссылку на сообщение для редактирования
+        jump_url = self.ref_message.jump_url if self.ref_message else self.message_data.get("source_url")
         edit_embed = create_embed(
             "Редактирование",
-            f"✏️ Отредактируйте исходное сообщение и снова используйте `/news`\n\n"
-            f"📝 [Перейти к сообщению]({self.ref_message.jump_url})",
+            f"✏️ Отредактируйте исходное сообщение и снова используйте `/news`"
+            + (f"\n\n📝 [Перейти к сообщению]({jump_url})" if jump_url else ""),
             INFO_COLOR
         )
         await interaction.response.edit_message(embed=edit_embed, view=None)
@@ -165,106 +616,112 @@ class ConfirmBroadcastView(View):
         for item in self.children:
             item.disabled = True
     
+    def start_prewarm(self):
+        """Открывает недостающие ЛС, пока админ смотрит на подтверждение"""
+        if isinstance(self.recipients, StreamedRecipients):
+            return
+        self.prewarm_task = asyncio.create_task(dm_channels.prewarm(
+            transport, self.recipients.ids, BROADCAST_CONCURRENCY,
+            bucket=scheduler.budget.lane(PRIORITY_NORMAL)
+        ))
+    
+    async def stop_prewarm(self):
+        if self.prewarm_task is not None and not self.prewarm_task.done():
+            self.prewarm_task.cancel()
+            await asyncio.gather(self.prewarm_task, return_exceptions=True)
+    
+    def stop(self):
+        if self.prewarm_task is not None:
+            self.prewarm_task.cancel()
+        super().stop()
+    
     async def do_broadcast(self, interaction: discord.Interaction):
         """Выполняет рассылку с обновлением прогресса"""
-        global last_broadcast
+        total = len(self.recipients)
         
-        success = 0
-        failed = 0
-        total = len(self.members)
+        async def edit_interaction(embed):
+            await interaction.edit_original_response(embed=embed, view=self)
         
-        content = self.message_data.get("content")
-        embeds = self.message_data.get("embeds", [])
-        files_data = self.message_data.get("files", [])
+        # Оценка не учитывает паузы, 429 и общий лимит: если рассылка переживёт
+        # токен интеракции, статус переедет в постоянное сообщение сам
+        status = StatusPublisher(edit_interaction)
+        status.on_expire = lambda: self.attach_status_message(interaction, status, total)
+        if expected_duration(total, self.window) > LONG_BROADCAST_SECONDS:
+            await self.attach_status_message(interaction, status, total)
         
-        print(f"[BROADCAST] Начало: {total} участников")
-        
-        for i, member in enumerate(self.members):
-            try:
-                # Создаём файлы для каждого участника
-                discord_files = []
-                for name, data in files_data:
-                    discord_files.append(discord.File(fp=io.BytesIO(data), filename=name))
-                
-                # Создаём красивый embed для новостей
-                news_embed = discord.Embed(
-                    title=f"{PEACH_EMOJI} PeachMine | Новости сервера",
-                    description=content if content else "",
-                    color=PEACH_COLOR,
-                    timestamp=datetime.now()
-                )
-                news_embed.set_footer(text=f"PeachMine » Minecraft Server • {datetime.now().strftime('%d.%m.%Y')}")
-                
-                # Добавляем инвайт в конце
-                invite_text = f"\n\n🔗 **Наш Discord:** {DISCORD_INVITE}"
-                
-                # Отправляем: если есть оригинальные embeds - их, иначе наш красивый
-                if embeds:
-                    final_content = (content + invite_text) if content else invite_text
-                    await member.send(
-                        content=final_content,
-                        embeds=embeds,
-                        files=discord_files if discord_files else None
-                    )
-                else:
-                    news_embed.description = (content or "") + invite_text
-                    await member.send(
-                        embed=news_embed,
-                        files=discord_files if discord_files else None
-                    )
-                
-                success += 1
-                print(f"[OK] {member.name}")
-                
-            except discord.Forbidden:
-                failed += 1
-                print(f"[FAIL] Закрыты ЛС: {member.name}")
-            except Exception as e:
-                failed += 1
-                print(f"[ERROR] {member.name}: {e}")
-            
-            # Обновляем прогресс каждые 5 сообщений
-            if (i + 1) % 5 == 0 or i == total - 1:
-                progress_embed = create_embed(
-                    "Рассылка",
-                    f"📤 **Отправка...**\n\n"
-                    f"✅ Успешно: **{success}**\n"
-                    f"❌ Ошибок: **{failed}**\n"
-                    f"⏳ Прогресс: `{i+1}/{total}`",
-                    WARNING_COLOR
-                )
-                try:
-                    await interaction.edit_original_response(embed=progress_embed, view=self)
-                except:
-                    pass
-            
-            await asyncio.sleep(1.5)
-        
-        # Сохраняем статистику
-        last_broadcast = {
-            "success": success,
-            "failed": failed,
-            "total": total,
-            "timestamp": datetime.now()
-        }
+        await run_broadcast(
+            self.broadcast_id, self.payload, self.recipients, status,
+            priority=self.priority,
+            owner_id=interaction.user.id,
+            title=broadcast_title(self.message_data),
+            window=self.window,
+            files_key=self.message_data.get("files_key"),
+            message_id=self.message_data.get("message_id")
+        )
+        self.stop()
+    
+    async def schedule_broadcast(self, interaction: discord.Interaction):
+        """Сохраняет рассылку в журнал и ставит её старт в планировщик"""
+        self.broadcast_id = await journal.start(
+            self.message_data.get("content"),
+            [e.to_dict() for e in self.message_data.get("embeds", [])],
+            self.message_data.get("files", []),
+            [],
+            self.ref_message.jump_url if self.ref_message else None,
+            total=len(self.recipients),
+            state=JOB_SCHEDULED,
+            start_at=self.start_at,
+            window=self.window,
+            priority=self.priority,
+            owner_id=interaction.user.id,
+            segment=self.segment.to_dict() if self.segment else None,
+            message_id=self.message_data.get("message_id")
+        )
+        if self.auto_new:
+            await enable_auto_delivery(self.broadcast_id, self.message_data.get("message_id"))
+        arm_scheduled(self.broadcast_id, self.start_at, self.priority, broadcast_title(self.message_data),
+                      interaction.user.id, self.window)
         
-        # Финальный embed
-        final_embed = create_embed(
-            "Рассылка завершена",
-            f"📊 **Результаты:**\n\n"
-            f"✅ Успешно отправлено: **{success}**\n"
-            f"❌ Не удалось отправить: **{failed}**\n"
-            f"👥 Всего участников: **{total}**\n\n"
-            f"📈 Успешность: **{round(success/total*100, 1)}%**",
-            SUCCESS_COLOR if failed == 0 else WARNING_COLOR
+        scheduled_embed = create_embed(
+            "Рассылка запланирована",
+            f"🕒 **Рассылка #{self.broadcast_id}** начнётся <t:{int(self.start_at)}:f> "
+            f"(<t:{int(self.start_at)}:R>)\n"
+            + (f"🐢 Окно доставки: **{format_duration(self.window)}**\n" if self.window else "")
+            + f"\n👥 Получатели определятся в момент старта (сейчас ~{len(self.recipients)})\n"
+            + ("🆕 Новым участникам сообщение придёт при входе\n" if self.auto_new else "")
+            + f"📌 Статус появится {'в канале статуса' if STATUS_CHANNEL_ID else 'в ЛС'}\n"
+            f"🛑 Отменить: `/broadcast cancel broadcast_id:{self.broadcast_id}`",
+            INFO_COLOR
         )
+        await interaction.edit_original_response(embed=scheduled_embed, view=self)
+        self.stop()
+    
+    async def attach_status_message(self, interaction: discord.Interaction, status: StatusPublisher, total: int):
+        """Переносит статус долгой рассылки в постоянное сообщение бота"""
+        status_message = await post_status_message(interaction.user, total)
+        if status_message is None:
+            return
         
-        await interaction.edit_original_response(embed=final_embed, view=self)
-        print(f"[BROADCAST] Завершено: {success}/{total}")
+        async def edit_message(embed):
+            await status_message.edit(embed=embed)
         
-        self.stop()
+        status.attach(edit_message)
+        
+        note_embed = create_embed(
+            "Рассылка",
+            f"📤 **Отправка началась...**\n\n"
+            f"👥 Получателей: **{total}**\n\n"
+            f"📌 Рассылка долгая — статус и итоги будут [здесь]({status_message.jump_url})",
+            WARNING_COLOR
+        )
+        try:
+            await interaction.edit_original_response(embed=note_embed, view=self)
+        except:
+            pass
     
     async def on_timeout(self):
+        if self.prewarm_task is not None:
+            self.prewarm_task.cancel()
         self.disable_all_items()
         timeout_embed = create_embed(
             "Время истекло",
@@ -281,8 +738,57 @@ class ConfirmBroadcastView(View):
 # 📨 КОМАНДА /NEWS
 # ═══════════════════════════════════════════════════════════
 
-@bot.slash_command(name="news", description="📨 Рассылка сообщения всем участникам", guild_ids=[GUILD_ID])
-async def news(ctx: discord.ApplicationContext, message_id: discord.Option(str, "ID сообщения для рассылки", required=True)):
+@bot.slash_command(name="news", description="📨 Рассылка сообщения всем участникам", guild_ids=GUILD_IDS)
+async def news(
+    ctx: discord.ApplicationContext,
+    message_id: discord.Option(str, "ID сообщения для рассылки", required=False, default=None),
+    mode: discord.Option(
+        str, "Режим рассылки",
+        choices=[
+            discord.OptionChoice("📨 Новая рассылка", "send"),
+            discord.OptionChoice("♻️ Продолжить прерванную", "resume"),
+            discord.OptionChoice("🧪 Пробный прогон: оценка времени и объёма", "dry_run"),
+            discord.OptionChoice("🆕 Только тем, кто ещё не получал", "delta"),
+        ],
+        required=False, default="send"
+    ),
+    priority: discord.Option(
+        str, "Приоритет: срочная рассылка получает большую часть общего лимита скорости",
+        choices=[
+            discord.OptionChoice("📰 Обычная", PRIORITY_NORMAL),
+            discord.OptionChoice("🚨 Срочная", PRIORITY_URGENT),
+        ],
+        required=False, default=PRIORITY_NORMAL
+    ),
+    start_at: discord.Option(
+        str, "Отложенный старт: ЧЧ:ММ, ДД.ММ ЧЧ:ММ или ДД.ММ.ГГГГ ЧЧ:ММ",
+        required=False, default=None
+    ),
+    window: discord.Option(
+        int, "Окно доставки в минутах: рассылка пойдёт равномерно за это время",
+        min_value=1, max_value=7 * 24 * 60, required=False, default=None
+    ),
+    roles: discord.Option(
+        str, "Только участникам с ролями (упоминания @роль через пробел)",
+        required=False, default=None
+    ),
+    exclude_roles: discord.Option(
+        str, "Кроме участников с ролями (упоминания @роль через пробел)",
+        required=False, default=None
+    ),
+    role_match: discord.Option(
+        str, "Как сочетать роли из roles",
+        choices=[
+            discord.OptionChoice("Любая из ролей (ИЛИ)", "any"),
+            discord.OptionChoice("Все роли сразу (И)", "all"),
+        ],
+        required=False, default="any"
+    ),
+    auto_new: discord.Option(
+        bool, "Досылать сообщение новым участникам при входе на сервер",
+        required=False, default=False
+    )
+):
     """Рассылка с подтверждением через кнопки"""
     
     # Проверка админа
@@ -292,6 +798,40 @@ async def news(ctx: discord.ApplicationContext, message_id: discord.Option(str,
     
     await ctx.defer(ephemeral=True)
     
+    if mode == "resume":
+        await resume_broadcast(ctx)
+        return
+    
+    if not message_id:
+        await ctx.followup.send(embed=create_error_embed("Укажите ID сообщения для рассылки"), ephemeral=True)
+        return
+    
+    start_timestamp = None
+    if start_at:
+        try:
+            start_timestamp = parse_start_time(start_at)
+        except ValueError:
+            await ctx.followup.send(
+                embed=create_error_embed("Не понял время старта. Формат: `ЧЧ:ММ` или `ДД.ММ ЧЧ:ММ`"),
+                ephemeral=True
+            )
+            return
+        if start_timestamp <= time.time():
+            # Опечатка в годе не должна превращаться в немедленную рассылку
+            await ctx.followup.send(
+                embed=create_error_embed(f"Время старта уже прошло: <t:{int(start_timestamp)}:f>"),
+                ephemeral=True
+            )
+            return
+    window_seconds = window * 60 if window else None
+    if mode == "delta" and start_timestamp is not None:
+        # Кто уже получил — считается сейчас; к старту список устарел бы
+        await ctx.followup.send(
+            embed=create_error_embed("Дельта-рассылка запускается сразу, без `start_at`"),
+            ephemeral=True
+        )
+        return
+    
     # Получаем сообщение по ID
     try:
         ref_message = await ctx.channel.fetch_message(int(message_id))
@@ -300,56 +840,632 @@ async def news(ctx: discord.ApplicationContext, message_id: discord.Option(str,
         return
     
     # Получаем участников
-    guild = bot.get_guild(GUILD_ID)
-    if not guild:
+    guilds = broadcast_guilds()
+    if not guilds:
         await ctx.followup.send(embed=create_error_embed("Сервер не найден"), ephemeral=True)
         return
     
-    members = [m for m in guild.members if not m.bot]
+    try:
+        segment = Segment(
+            parse_roles(guilds, roles),
+            parse_roles(guilds, exclude_roles),
+            match_all=role_match == "all"
+        )
+    except ValueError as e:
+        await ctx.followup.send(embed=create_error_embed(f"Роль не найдена: `{e}`"), ephemeral=True)
+        return
+    
+    # Дельта: только тем, кому это сообщение ещё не доставлено ни одной рассылкой
+    delivered = await ledger.get(ref_message.id) if mode == "delta" else None
+    recipients, skipped_closed, duplicates = await collect_audience(guilds, segment, delivered)
+    delta_text = f"🆕 **Уже получили это сообщение:** {len(delivered)}\n" if delivered is not None else ""
+    guilds_text = (
+        f"🌐 **Серверов:** {len(guilds)}"
+        + (f", повторов убрано: {duplicates}" if duplicates else "")
+        + "\n"
+    ) if len(guilds) > 1 else ""
+    if MEMBER_CACHE:
+        audience_text = (
+            f"{describe_segment(segment)}"
+            f"{guilds_text}"
+            f"{delta_text}"
+            f"👥 **Получателей:** {len(recipients)}\n"
+            f"🔕 **Пропущено (ЛС закрыты):** {skipped_closed}\n"
+            f"📬 **ЛС уже открыты:** {sum(uid in dm_channels for uid in recipients)}\n"
+        )
+    else:
+        audience_text = (
+            f"{describe_segment(segment)}"
+            f"{guilds_text}"
+            f"{delta_text}"
+            f"👥 **Получателей:** {'до ' if segment or len(guilds) > 1 or delivered else ''}~{len(recipients)}\n"
+            f"🔕 **Закрытые ЛС** будут пропущены при отправке\n"
+        )
     
-    if not members:
-        await ctx.followup.send(embed=create_error_embed("Нет участников для рассылки"), ephemeral=True)
+    if not len(recipients):
+        text = "Все участники уже получили это сообщение" if delivered else "Нет участников для рассылки"
+        await ctx.followup.send(embed=create_error_embed(text), ephemeral=True)
         return
     
+    # То же сообщение уже готовили (правка и повторный /news) — вложения берём из кэша
+    attachment_ids = [a.id for a in ref_message.attachments]
+    cache_key = content_key(ref_message.content, [e.to_dict() for e in ref_message.embeds], attachment_ids)
+    prepared = payload_cache.get_message(cache_key)
+    if prepared is None:
+        # Вложения качаются параллельно; крупные лежат во временных файлах (mmap), а не в памяти.
+        # Неизменённые вложения отредактированного сообщения тоже берутся из кэша по ID
+        files, skipped_files, files_key = await prefetch(
+            ref_message.attachments, max_size=ATTACHMENT_MAX_BYTES, cache=payload_cache
+        )
+        if skipped_files:
+            logger.warning("broadcast.attachments_skipped", files=dict(skipped_files))
+        prepared = (files, skipped_files, files_key)
+        # Не скачавшееся вложение (сетевая ошибка) попробуем снова при следующем /news —
+        # кэшируем только если всё пропущенное пропущено по размеру
+        if all(reason == SKIP_TOO_LARGE for _, reason in skipped_files):
+            payload_cache.put_message(cache_key, prepared, files_key)
+    files, skipped_files, files_key = prepared
+    
     # Подготавливаем данные сообщения
     message_data = {
         "content": ref_message.content,
         "embeds": ref_message.embeds,
-        "files": []
+        "files": files,
+        "files_key": files_key,
+        "message_id": ref_message.id
     }
     
-    for attachment in ref_message.attachments:
-        try:
-            file_data = await attachment.read()
-            message_data["files"].append((attachment.filename, file_data))
-        except:
-            pass
+    # Итоговое сообщение (с инвайтом) проверяем один раз сейчас, а не тысячей одинаковых 400
+    payload = compile_broadcast(message_data)
+    problems = validate(payload.data, payload.files, max_file_size=ATTACHMENT_MAX_BYTES)
+    if not problems and payload.files and ATTACHMENT_FANOUT != FANOUT_OFF:
+        # После первой загрузки файлы станут ссылками в тексте — он тоже должен влезать
+        problems = [f"Со ссылками на вложения — {problem}" for problem in reference_problems(payload)]
+    if problems:
+        logger.warning("broadcast.payload_invalid", message=ref_message.id, problems=problems)
+        await ctx.followup.send(embed=create_error_embed(
+            "Сообщение не влезает в лимиты Discord — рассылка не начата:\n"
+            + "\n".join(f"• {problem}" for problem in problems)
+            + "\n\nСократите сообщение и снова используйте `/news`"
+        ), ephemeral=True)
+        return
+    split_text_note = (
+        f"✂️ **Длинный текст** разбит на {len(payload.data['embeds'])} embed'а в одном сообщении\n"
+        if not message_data["embeds"] and len(payload.data["embeds"]) > 1 else ""
+    )
     
     # Превью сообщения
     preview = ref_message.content[:200] + "..." if len(ref_message.content) > 200 else ref_message.content
     if not preview:
         preview = "*[Embed или изображение]*"
     
+    # Пробный прогон: вся цепочка отправки вхолостую — сколько ЛС, байт и времени
+    dry_run_text = ""
+    if mode == "dry_run":
+        projection = await simulate(
+            recipients, payload,
+            rate=scheduler.projected_rate(priority),
+            concurrency=BROADCAST_CONCURRENCY,
+            pace=broadcast_pace(len(recipients), window_seconds),
+            fanout_mode=ATTACHMENT_FANOUT,
+            staging_channel_id=STAGING_CHANNEL_ID,
+            dm_channels=dm_channels
+        )
+        if isinstance(recipients, StreamedRecipients):
+            # Источник прочитан целиком — теперь число получателей точное
+            recipients.expected = projection["sends"]
+            if not projection["sends"]:
+                await ctx.followup.send(embed=create_error_embed("Нет участников для рассылки"), ephemeral=True)
+                return
+        dry_run_text = (
+            f"🧪 **Пробный прогон** (ничего не отправлено):\n"
+            f"📨 ЛС к отправке: **{projection['sends']}** · запросов к API: {projection['requests']}"
+            + (f", из них открыть ЛС: {projection['dm_opened']}" if projection["dm_opened"] else "")
+            + f"\n⏱️ Займёт: **~{format_duration(projection['seconds'])}** "
+            f"при {projection['rate']:.1f} сообщ./с\n"
+            f"📦 Сообщение: **{format_size(projection['payload_bytes'])}** · "
+            f"всего уйдёт: **{format_size(projection['sent_bytes'])}**\n\n"
+        )
+    
+    # Когда и как быстро пойдёт рассылка
+    timing_text = ""
+    if start_timestamp is not None:
+        timing_text += f"🕒 **Старт:** <t:{int(start_timestamp)}:f> (<t:{int(start_timestamp)}:R>)\n"
+    if window_seconds:
+        duration = expected_duration(len(recipients), window_seconds)
+        timing_text += f"🐢 **Окно доставки:** {format_duration(window_seconds)}"
+        if duration > window_seconds:
+            timing_text += f" (при общем лимите займёт ~{format_duration(duration)})"
+        timing_text += "\n"
+    
     # Embed подтверждения
     confirm_embed = create_embed(
         "Подтверждение рассылки",
         f"📝 **Превью сообщения:**\n```{preview}```\n\n"
-        f"👥 **Получателей:** {len(members)}\n"
+        f"{audience_text}"
+        f"{timing_text}"
         f"📎 **Вложений:** {len(message_data['files'])}\n"
-        f"📋 **Embed'ов:** {len(message_data['embeds'])}\n\n"
+        + (f"⚠️ **Не будут отправлены:** {', '.join(f'`{name}`' for name, _ in skipped_files)} "
+           f"(больше {format_size(ATTACHMENT_MAX_BYTES)} или не скачались)\n" if skipped_files else "")
+        + f"📋 **Embed'ов:** {len(message_data['embeds'])}\n"
+        + split_text_note
+        + ("🆕 **Новым участникам** сообщение придёт при входе\n" if auto_new else "")
+        + f"\n{dry_run_text}"
         f"⚠️ Нажмите кнопку для подтверждения",
         WARNING_COLOR
     )
     
-    view = ConfirmBroadcastView(message_data, members, ctx, ref_message)
+    view = ConfirmBroadcastView(message_data, recipients, ctx, ref_message, priority=priority,
+                                start_at=start_timestamp, window=window_seconds, segment=segment,
+                                auto_new=auto_new)
+    await ctx.followup.send(embed=confirm_embed, view=view, ephemeral=True)
+    view.start_prewarm()
+
+
+def broadcast_guilds() -> list:
+    """Серверы рассылки, которые бот сейчас видит"""
+    return [guild for guild in map(bot.get_guild, GUILD_IDS) if guild is not None]
+
+
+def parse_roles(guilds: list, text: str) -> list:
+    """ID ролей из упоминаний <@&id> или голых ID; ValueError — если роли нет ни на одном сервере"""
+    if not text:
+        return []
+    role_ids = []
+    for token in text.split():
+        match = re.fullmatch(r"<@&(\d+)>|(\d+)", token)
+        role = None
+        if match:
+            role_id = int(match.group(1) or match.group(2))
+            role = next(filter(None, (guild.get_role(role_id) for guild in guilds)), None)
+        if role is None:
+            raise ValueError(token)
+        if role.id not in role_ids:
+            role_ids.append(role.id)
+    return role_ids
+
+
+def describe_segment(segment: Segment) -> str:
+    """Строка про фильтр по ролям для embed подтверждения"""
+    if not segment:
+        return ""
+    text = ""
+    if segment.include:
+        joiner = " и " if segment.match_all else " или "
+        text += f"🎯 **Роли:** {joiner.join(f'<@&{r}>' for r in segment.include)}\n"
+    if segment.exclude:
+        text += f"🚫 **Кроме ролей:** {', '.join(f'<@&{r}>' for r in segment.exclude)}\n"
+    return text
+
+
+def present_ids(guilds: list, user_ids) -> array:
+    """ID тех, кто ещё есть хотя бы на одном из серверов (кто вышел — пропускается)"""
+    lookups = [guild.get_member for guild in guilds]
+    return array("Q", (
+        user_id for user_id in user_ids
+        if any(get_member(user_id) is not None for get_member in lookups)
+    ))
+
+
+async def collect_audience(guilds: list, segment: Segment = None, delivered: DeliveredSet = None):
+    """
+    Получатели рассылки со всех серверов без повторов, сколько пропущено
+    из-за закрытых ЛС и сколько повторов убрано. Без кэша участников —
+    потоковый источник; закрытые ЛС и повторы отсеются при чтении, поэтому
+    оба числа неизвестны (None). `delivered` — кому сообщение уже доставлено
+    (дельта-рассылка): они пропускаются.
+    """
+    segment = segment or Segment()
+    if MEMBER_CACHE:
+        # Получатели из индекса (с фильтром по ролям) — без прохода по guild.members;
+        # человек с нескольких серверов получает одно ЛС
+        ids, duplicates = member_index.merged_audience([g.id for g in guilds], segment)
+        if delivered is not None:
+            ids = delivered.missing(ids)
+        # Пропускаем тех, у кого ЛС были закрыты в прошлых рассылках
+        ids, skipped_closed = closed_dms.split(ids)
+        return RecipientList(ids), skipped_closed, duplicates
+    # Без кэша участников — получатели подгрузятся страницами во время рассылки
+    expected = sum([await guild_member_count(guild) for guild in guilds])
+    if delivered is not None:
+        expected = max(expected - len(delivered), 1)
+    return StreamedRecipients(lambda: stream_recipients(guilds, delivered, segment), expected), None, None
+
+
+def arm_scheduled(broadcast_id: int, start_at: float, priority: str, title: str, owner_id: int,
+                  window: float = None):
+    scheduler.schedule(broadcast_id, start_at, lambda: run_scheduled(broadcast_id),
+                       priority=priority, title=title, owner_id=owner_id, window=window)
+
+
+async def run_scheduled(broadcast_id: int):
+    """Старт запланированной рассылки: получатели на момент старта, статус — в постоянном сообщении"""
+    record = await journal.get(broadcast_id)
+    if record is None or record["state"] != JOB_SCHEDULED:
+        return
+    guilds = broadcast_guilds()
+    if not guilds:
+        logger.error("broadcast.scheduled_failed", broadcast=broadcast_id, error="guild not found")
+        return
+    
+    recipients, _, _ = await collect_audience(guilds, Segment.from_dict(record["segment"]))
+    streamed = isinstance(recipients, StreamedRecipients)
+    await journal.activate(broadcast_id, [] if streamed else recipients.ids, len(recipients))
+    
+    # Токен интеракции давно истёк — статус только в постоянном сообщении
+    owner_id = record["owner_id"] or ADMIN_IDS[0]
+    owner = bot.get_user(owner_id) or await bot.fetch_user(owner_id)
+    status = StatusPublisher(None, token_ttl=0)
+    status_message = await post_status_message(owner, len(recipients))
+    if status_message is not None:
+        async def edit_message(embed):
+            await status_message.edit(embed=embed)
+        status.attach(edit_message)
+    
+    message_data = message_data_from_record(record)
+    await run_broadcast(
+        broadcast_id, compile_broadcast(message_data), recipients, status,
+        priority=record["priority"],
+        owner_id=owner_id,
+        title=broadcast_title(message_data),
+        window=record["window"],
+        message_id=message_data["message_id"]
+    )
+
+
+async def fetch_members_uncached(guild: discord.Guild):
+    """guild.fetch_members без следа в памяти: py-cord кладёт каждого User в общий кэш пользователей насовсем"""
+    state = guild._state
+    # Кто был в кэше до нас (админы, авторы ЛС, интеракции) — нужен не только рассылке, не трогаем
+    known = set(state._users)
+    async for member in guild.fetch_members(limit=None):
+        yield member
+        if member.id not in known:
+            state.deref_user(member.id)
+
+
+async def stream_recipients(guilds: list, skip_ids=None, segment: Segment = None):
+    """ID участников-людей страницами через REST — без кэша участников; `skip_ids` — set или DeliveredSet"""
+    # С нескольких серверов помним, кому уже выдали — одно ЛС на человека
+    seen = set() if len(guilds) > 1 else None
+    excluded = set()
+    if seen is not None and segment and segment.exclude:
+        # Исключающая роль на одном сервере исключает и на остальных — таких собираем
+        # заранее отдельным проходом (в памяти только они), иначе второй сервер вернул бы их
+        for guild in guilds:
+            async for member in fetch_members_uncached(guild):
+                if segment.excludes(r.id for r in member.roles):
+                    excluded.add(member.id)
+    for guild in guilds:
+        async for member in fetch_members_uncached(guild):
+            if member.bot or (skip_ids and member.id in skip_ids) or member.id in excluded:
+                continue
+            if segment and not segment.matches(r.id for r in member.roles):
+                continue
+            if closed_dms.is_suppressed(member.id):
+                continue
+            if seen is not None:
+                if member.id in seen:
+                    continue
+                seen.add(member.id)
+            yield member.id
+
+
+async def guild_member_count(guild: discord.Guild) -> int:
+    """Число участников: точное из индекса или (без кэша) примерное от Discord"""
+    if MEMBER_CACHE:
+        return member_index.count(guild.id)
+    full_guild = await bot.fetch_guild(guild.id, with_counts=True)
+    return full_guild.approximate_member_count or 0
+
+
+def remaining_window(record: dict):
+    """Сколько осталось от окна доставки прерванной рассылки (None — окна нет или оно уже вышло)"""
+    if not record["window"]:
+        return None
+    started = record["start_at"] or record["created_at"]
+    remaining = started + record["window"] - time.time()
+    return remaining if remaining > 0 else None
+
+
+async def resume_broadcast(ctx: discord.ApplicationContext):
+    """Продолжает прерванную рассылку только по тем, кому ещё не отправляли — с её приоритетом и окном"""
+    record = await journal.unfinished()
+    if not record:
+        await ctx.followup.send(embed=create_error_embed("Нет прерванных рассылок"), ephemeral=True)
+        return
+    if scheduler.get(record["id"]):
+        await ctx.followup.send(
+            embed=create_error_embed(f"Рассылка #{record['id']} ещё идёт — см. `/broadcast list`"),
+            ephemeral=True
+        )
+        return
+    if record["replay_state"] is not None:
+        # Прерван повтор, а не сама рассылка: возвращаем ей прежнее состояние
+        await journal.finish(record["id"])
+        await save_outcomes(record["id"])
+        await ctx.followup.send(embed=create_error_embed(
+            f"Прерван повтор рассылки #{record['id']} — запустите `/broadcast replay {record['id']}` снова"
+        ), ephemeral=True)
+        return
+    
+    guilds = broadcast_guilds()
+    if not guilds:
+        await ctx.followup.send(embed=create_error_embed("Сервер не найден"), ephemeral=True)
+        return
+    
+    if MEMBER_CACHE:
+        # Кто успел выйти со всех серверов — пропускаем
+        pending_ids = await journal.pending_recipients(record["id"])
+        recipients = RecipientList(present_ids(guilds, pending_ids))
+    else:
+        # Заново читаем участников и пропускаем тех, по кому уже есть итог
+        done = await journal.processed_recipients(record["id"])
+        segment = Segment.from_dict(record["segment"])
+        recipients = StreamedRecipients(
+            lambda: stream_recipients(guilds, done, segment),
+            max(record["total"] - record["processed"], 1)
+        )
+    
+    if not len(recipients):
+        await journal.finish(record["id"])
+        await save_outcomes(record["id"])
+        await ctx.followup.send(embed=create_success_embed("Всем получателям уже отправлено"), ephemeral=True)
+        return
+    
+    message_data = message_data_from_record(record)
+    # Остаток получателей идёт равномерно за остаток окна, а не на полной скорости
+    window = remaining_window(record)
+    window_text = ""
+    if window:
+        window_text = f"🐢 **Осталось от окна доставки:** {format_duration(window)}\n"
+    elif record["window"]:
+        window_text = "🐢 **Окно доставки истекло** — остаток уйдёт без растяжки\n"
+    
+    started = datetime.fromtimestamp(record["created_at"]).strftime('%d.%m.%Y %H:%M')
+    confirm_embed = create_embed(
+        "Продолжение рассылки",
+        f"♻️ **Рассылка #{record['id']}** от {started} была прервана\n\n"
+        f"📤 Обработано: **{record['processed']}/{record['total']}**\n"
+        f"👥 **Осталось получателей:** {len(recipients)}\n"
+        f"{window_text}"
+        f"📎 **Вложений:** {len(message_data['files'])}\n"
+        f"📋 **Embed'ов:** {len(message_data['embeds'])}\n\n"
+        f"⚠️ Нажмите кнопку для продолжения",
+        WARNING_COLOR
+    )
+    
+    view = ConfirmBroadcastView(message_data, recipients, ctx, None, broadcast_id=record["id"],
+                                priority=record["priority"], window=window)
     await ctx.followup.send(embed=confirm_embed, view=view, ephemeral=True)
+    view.start_prewarm()
+
+
+# ═══════════════════════════════════════════════════════════
+# ⏯️ КОМАНДА /BROADCAST — управление идущими рассылками
+# ═══════════════════════════════════════════════════════════
+
+broadcast_group = bot.create_group("broadcast", "⏯️ Управление рассылками", guild_ids=GUILD_IDS)
+
+JOB_STATE_LABELS = {JOB_RUNNING: "📤 идёт", JOB_PAUSED: "⏸️ на паузе", JOB_CANCELLED: "🛑 отменяется"}
+PRIORITY_LABELS = {PRIORITY_NORMAL: "📰 обычная", PRIORITY_URGENT: "🚨 срочная"}
+
+
+@broadcast_group.command(name="list", description="📋 Идущие и запланированные рассылки")
+async def broadcast_list(ctx: discord.ApplicationContext):
+    if ctx.author.id not in ADMIN_IDS:
+        await ctx.respond(embed=create_error_embed("У вас нет прав для этой команды"), ephemeral=True)
+        return
+    
+    jobs = scheduler.active()
+    upcoming = scheduler.scheduled()
+    dead_letters = await journal.dead_letter_counts()
+    if not jobs and not upcoming and not dead_letters and not auto_deliveries:
+        await ctx.respond(embed=create_embed("Рассылки", "💤 Сейчас рассылок нет", INFO_COLOR), ephemeral=True)
+        return
+    
+    lines = []
+    for entry in upcoming:
+        lines.append(
+            f"**#{entry.id}** · {PRIORITY_LABELS[entry.priority]} · 🕒 <t:{int(entry.start_at)}:f>"
+            + (f" · окно {format_duration(entry.window)}" if entry.window else "")
+            + f"\n<@{entry.owner_id}> · {entry.title}"
+        )
+    for job in jobs:
+        processed = job.stats["success"] + job.stats["failed"]
+        lines.append(
+            f"**#{job.id}** · {PRIORITY_LABELS[job.priority]} · {JOB_STATE_LABELS[job.state]}\n"
+            f"`{processed}/{job.stats['total']}` · <@{job.owner_id}> · {job.title}"
+        )
+    for broadcast_id, count, error in dead_letters[:5]:
+        lines.append(
+            f"**#{broadcast_id}** · 📮 ждут повтора: **{count}**"
+            + (f" · `{error[:60]}`" if error else "")
+            + f"\n`/broadcast replay broadcast_id:{broadcast_id}`"
+        )
+    for broadcast_id in sorted(auto_deliveries):
+        lines.append(
+            f"**#{broadcast_id}** · 🆕 досылается новым участникам\n"
+            f"`/broadcast cancel broadcast_id:{broadcast_id}` — выключить"
+        )
+    lines.append(f"\n🚀 Общий лимит: **{scheduler.budget.bucket.rate:.1f}** сообщ./с")
+    await ctx.respond(embed=create_embed("Рассылки", "\n\n".join(lines), INFO_COLOR), ephemeral=True)
+
+
+async def control_broadcast(ctx: discord.ApplicationContext, broadcast_id: int, action, done_text: str):
+    """Общая часть pause/resume/cancel: проверка прав, действие и мгновенное обновление статуса"""
+    if ctx.author.id not in ADMIN_IDS:
+        await ctx.respond(embed=create_error_embed("У вас нет прав для этой команды"), ephemeral=True)
+        return
+    
+    job = scheduler.get(broadcast_id)
+    if job is None:
+        text = (f"Рассылка #{broadcast_id} ещё не началась — её можно только отменить"
+                if broadcast_id in scheduler.pending else f"Рассылка #{broadcast_id} не идёт")
+        await ctx.respond(embed=create_error_embed(text), ephemeral=True)
+        return
+    if not action(broadcast_id):
+        await ctx.respond(
+            embed=create_error_embed(f"Рассылка #{broadcast_id} сейчас {JOB_STATE_LABELS[job.state]}"),
+            ephemeral=True
+        )
+        return
+    
+    logger.info("broadcast.control", broadcast=broadcast_id, state=job.state, admin=ctx.author.id)
+    await ctx.respond(embed=create_success_embed(done_text.format(id=broadcast_id)), ephemeral=True)
+    if job.notify is not None:
+        try:
+            await job.notify()
+        except Exception:
+            pass
+
+
+@broadcast_group.command(name="pause", description="⏸️ Поставить рассылку на паузу")
+async def broadcast_pause(
+    ctx: discord.ApplicationContext,
+    broadcast_id: discord.Option(int, "ID рассылки (см. /broadcast list)")
+):
+    await control_broadcast(ctx, broadcast_id, scheduler.pause, "Рассылка #{id} на паузе")
+
+
+@broadcast_group.command(name="resume", description="▶️ Продолжить рассылку после паузы")
+async def broadcast_resume(
+    ctx: discord.ApplicationContext,
+    broadcast_id: discord.Option(int, "ID рассылки (см. /broadcast list)")
+):
+    await control_broadcast(ctx, broadcast_id, scheduler.resume, "Рассылка #{id} продолжена")
+
+
+@broadcast_group.command(name="cancel", description="🛑 Отменить рассылку")
+async def broadcast_cancel(
+    ctx: discord.ApplicationContext,
+    broadcast_id: discord.Option(int, "ID рассылки (см. /broadcast list)")
+):
+    # Отмена выключает и досылку новым участникам — в том числе у уже завершённой рассылки
+    auto_disabled = ctx.author.id in ADMIN_IDS and await disable_auto_delivery(broadcast_id)
+    # Запланированная рассылка ещё не стартовала — просто снимаем её с расписания
+    if ctx.author.id in ADMIN_IDS and scheduler.cancel_scheduled(broadcast_id):
+        await journal.finish(broadcast_id, JOB_CANCELLED)
+        logger.info("broadcast.control", broadcast=broadcast_id, state=JOB_CANCELLED, admin=ctx.author.id)
+        await ctx.respond(embed=create_success_embed(f"Запланированная рассылка #{broadcast_id} отменена"),
+                          ephemeral=True)
+        return
+    if auto_disabled and scheduler.get(broadcast_id) is None:
+        logger.info("broadcast.auto_disabled", broadcast=broadcast_id, admin=ctx.author.id)
+        await ctx.respond(embed=create_success_embed(f"Досылка рассылки #{broadcast_id} новым участникам выключена"),
+                          ephemeral=True)
+        return
+    await control_broadcast(ctx, broadcast_id, scheduler.cancel, "Рассылка #{id} отменяется")
+
+
+@broadcast_group.command(name="replay", description="📮 Переотправить тем, кому помешали сбои Discord")
+async def broadcast_replay(
+    ctx: discord.ApplicationContext,
+    broadcast_id: discord.Option(int, "ID рассылки (см. /broadcast list)"),
+    errors: discord.Option(
+        bool, "Также тем, у кого была другая ошибка (кроме закрытых ЛС)",
+        required=False, default=False
+    )
+):
+    if ctx.author.id not in ADMIN_IDS:
+        await ctx.respond(embed=create_error_embed("У вас нет прав для этой команды"), ephemeral=True)
+        return
+    if scheduler.get(broadcast_id) or broadcast_id in scheduler.pending:
+        await ctx.respond(embed=create_error_embed(f"Рассылка #{broadcast_id} ещё не закончилась"),
+                          ephemeral=True)
+        return
+    
+    await ctx.defer(ephemeral=True)
+    record = await journal.get(broadcast_id)
+    if record and record["state"] == JOB_RUNNING and record["replay_state"] is None:
+        # Саму рассылку прервал редеплой: повтор закончил бы её, и оставшихся уже не продолжить
+        await ctx.followup.send(
+            embed=create_error_embed(
+                f"Рассылка #{broadcast_id} прервана и ещё не всем отправлена — "
+                "сначала продолжите её: `/news mode:♻️ Продолжить прерванную`"
+            ),
+            ephemeral=True
+        )
+        return
+    if record and record["files_purged"]:
+        await ctx.followup.send(
+            embed=create_error_embed(
+                f"Вложения рассылки #{broadcast_id} уже удалены из журнала "
+                f"(хранятся {BROADCAST_FILES_DAYS:g} дн.) — без них повтор был бы другим сообщением"
+            ),
+            ephemeral=True
+        )
+        return
+    user_ids = await replay_targets(broadcast_id, record, errors) if record else []
+    if not user_ids:
+        await ctx.followup.send(
+            embed=create_error_embed(f"У рассылки #{broadcast_id} нет получателей, ждущих повтора"),
+            ephemeral=True
+        )
+        return
+    
+    recipients = RecipientList(user_ids)
+    message_data = message_data_from_record(record)
+    logger.info("broadcast.replay", broadcast=broadcast_id, recipients=len(recipients), admin=ctx.author.id)
+    # До конца повтора рассылка снова running: если его прервёт редеплой,
+    # следующий replay перевыгрузит итоги из журнала, а не возьмёт старый файл
+    await journal.reopen(broadcast_id)
+    
+    await ctx.interaction.edit_original_response(embed=create_embed(
+        "Рассылка",
+        f"📮 **Повтор рассылки #{broadcast_id}...**\n\n"
+        f"👥 Получателей: **{len(recipients)}**",
+        WARNING_COLOR
+    ))
+    
+    async def edit_interaction(embed):
+        await ctx.interaction.edit_original_response(embed=embed)
+    
+    async def attach_status():
+        status_message = await post_status_message(ctx.author, len(recipients))
+        if status_message is not None:
+            async def edit_message(embed):
+                await status_message.edit(embed=embed)
+            status.attach(edit_message)
+    
+    # Долгий повтор — сразу в постоянное сообщение, иначе туда же, когда истечёт токен
+    status = StatusPublisher(edit_interaction, on_expire=attach_status)
+    if expected_duration(len(recipients)) > LONG_BROADCAST_SECONDS:
+        await attach_status()
+    
+    await run_broadcast(
+        broadcast_id, compile_broadcast(message_data), recipients, status,
+        priority=record["priority"],
+        owner_id=ctx.author.id,
+        title=broadcast_title(message_data),
+        replay=True,
+        message_id=message_data["message_id"]
+    )
+
+
+async def replay_targets(broadcast_id: int, record: dict, errors: bool = False) -> array:
+    """
+    Кому переотправить: получатели с временной ошибкой (и, если `errors`, с
+    любой другой, кроме закрытых ЛС) — из файла итогов, без прохода по журналу.
+    """
+    if record["state"] == JOB_RUNNING or not os.path.exists(outcome_store.path(broadcast_id)):
+        if record["state"] != JOB_RUNNING and not errors:
+            # Рассылка закончилась до появления файлов итогов — очередь повторов в журнале
+            return array("Q", await journal.dead_letters(broadcast_id))
+        # Повтор прервал редеплой — файл отстал от журнала
+        await save_outcomes(broadcast_id)
+    outcomes = await asyncio.to_thread(outcome_store.read, broadcast_id)
+    if outcomes is None:
+        return array("Q")
+    statuses = (STATUS_TRANSIENT, STATUS_ERROR) if errors else (STATUS_TRANSIENT,)
+    return outcomes.select(*statuses)
 
 
 # ═══════════════════════════════════════════════════════════
 # ℹ️ КОМАНДА /INFO
 # ═══════════════════════════════════════════════════════════
 
-@bot.slash_command(name="info", description="Информация о боте", guild_ids=[GUILD_ID])
+@bot.slash_command(name="info", description="Информация о боте", guild_ids=GUILD_IDS)
 async def info(ctx: discord.ApplicationContext):
     """Отправляет информацию в ЛС админу"""
     
@@ -359,8 +1475,20 @@ async def info(ctx: discord.ApplicationContext):
     
     await ctx.defer(ephemeral=True)
     
-    guild = bot.get_guild(GUILD_ID)
-    member_count = len([m for m in guild.members if not m.bot]) if guild else 0
+    counts = [(guild, await guild_member_count(guild)) for guild in broadcast_guilds()]
+    prefix = "" if MEMBER_CACHE else "~"
+    if len(counts) > 1:
+        member_count = "\n".join(f"{guild.name}: {prefix}{count}" for guild, count in counts)
+        if MEMBER_CACHE:
+            unique = len(member_index.merged_audience([guild.id for guild, _ in counts])[0])
+            member_count += f"\nБез повторов: {unique}"
+    else:
+        member_count = f"{prefix}{counts[0][1] if counts else 0}"
+    
+    # Память и время запуска — чтобы сравнивать режимы MEMBER_CACHE
+    memory = rss_mb()
+    memory_text = f"{memory:.0f} МБ" if memory is not None else "Неизвестно"
+    ready_text = f"{ready_seconds:.1f} с" if ready_seconds is not None else "Неизвестно"
     
     # Аптайм
     uptime = "Неизвестно"
@@ -387,6 +1515,8 @@ async def info(ctx: discord.ApplicationContext):
         f"```diff\n+ Онлайн```\n\n"
         f"**⏱️ Аптайм**\n{uptime}\n\n"
         f"**👥 Участников на сервере**\n{member_count}\n\n"
+        f"**💾 Память**\n{memory_text} (кэш участников: {'вкл' if MEMBER_CACHE else 'выкл'})\n"
+        f"Готов к работе за {ready_text}\n\n"
         f"**📨 Последняя рассылка**\n{broadcast_stats}",
         INFO_COLOR
     )
@@ -402,7 +1532,7 @@ async def info(ctx: discord.ApplicationContext):
 # 🔄 КОМАНДА /RESTART (только для локального запуска)
 # ═══════════════════════════════════════════════════════════
 
-@bot.slash_command(name="restart", description="🔄 Перезагрузить бота", guild_ids=[GUILD_ID])
+@bot.slash_command(name="restart", description="🔄 Перезагрузить бота", guild_ids=GUILD_IDS)
 async def restart_cmd(ctx: discord.ApplicationContext):
     """Перезагружает бота (работает только локально)"""
     
@@ -423,16 +1553,148 @@ def get_uptime():
     """Возвращает аптайм в читаемом формате"""
     if not start_time:
         return "Неизвестно"
-    delta = datetime.now() - start_time
-    hours, remainder = divmod(int(delta.total_seconds()), 3600)
-    minutes, seconds = divmod(remainder, 60)
-    return f"{hours}ч {minutes}м {seconds}с"
+    return format_duration((datetime.now() - start_time).total_seconds())
+
+
+# ═══════════════════════════════════════════════════════════
+# 🆕 ДОСЫЛКА НОВЫМ УЧАСТНИКАМ
+# ═══════════════════════════════════════════════════════════
+
+async def enable_auto_delivery(broadcast_id: int, message_id: int):
+    await journal.enable_auto(broadcast_id, message_id)
+    auto_deliveries[broadcast_id] = message_id
+    logger.info("broadcast.auto_enabled", broadcast=broadcast_id, message=message_id)
+
+
+async def disable_auto_delivery(broadcast_id: int) -> bool:
+    auto_deliveries.pop(broadcast_id, None)
+    return await journal.disable_auto(broadcast_id)
+
+
+def queue_new_member(member: discord.Member):
+    """Вошедший получит сообщения auto-рассылок со следующей пачкой"""
+    global auto_delivery_task
+    joined_members[member.id] = [role.id for role in member.roles]
+    if auto_delivery_task is None or auto_delivery_task.done():
+        auto_delivery_task = asyncio.create_task(deliver_to_new_members())
+
+
+async def deliver_to_new_members():
+    """Раз в AUTO_DELIVERY_BATCH_SECONDS досылает сообщения вошедшим за это время — пачкой, а не по одному"""
+    global joined_members
+    while joined_members:
+        await asyncio.sleep(AUTO_DELIVERY_BATCH_SECONDS)
+        joined, joined_members = joined_members, {}
+        waiting = {}
+        for broadcast_id, message_id in list(auto_deliveries.items()):
+            if scheduler.get(broadcast_id) or broadcast_id in scheduler.pending:
+                # Основная рассылка ещё не закончилась — новички могут попасть в неё саму
+                waiting.update(joined)
+                continue
+            try:
+                if not await deliver_followup(broadcast_id, message_id, joined):
+                    waiting.update(joined)
+            except Exception as e:
+                logger.error("broadcast.auto_failed", broadcast=broadcast_id, error=str(e))
+        # Вошедшие, пока ждали, уже в joined_members — не затираем их
+        for user_id, role_ids in waiting.items():
+            joined_members.setdefault(user_id, role_ids)
+
+
+async def deliver_followup(broadcast_id: int, message_id: int, joined: dict) -> bool:
+    """Досылка сообщения рассылки новым участникам; False — рассылка прервана, новичкам ждать"""
+    record = await journal.get(broadcast_id)
+    if record is None or record["state"] == JOB_CANCELLED:
+        await disable_auto_delivery(broadcast_id)
+        return True
+    if record["state"] == JOB_RUNNING:
+        # Прервана редеплоем: досылка завершила бы её как done, и /news resume её бы не нашёл
+        return False
+    segment = Segment.from_dict(record["segment"])
+    delivered = await ledger.get(message_id)
+    # Исключающая роль на любом из серверов (по индексу) тоже исключает
+    excluded = member_index.with_roles(GUILD_IDS, segment.exclude) if MEMBER_CACHE and segment.exclude else ()
+    user_ids = array("Q", sorted(
+        user_id for user_id, role_ids in joined.items()
+        if user_id not in delivered and user_id not in excluded
+        and (not segment or segment.matches(role_ids))
+    ))
+    if MEMBER_CACHE:
+        # Кто успел выйти — пропускаем
+        user_ids = present_ids(broadcast_guilds(), user_ids)
+    user_ids, _ = closed_dms.split(user_ids)
+    if not user_ids:
+        return True
+    
+    recipients = RecipientList(user_ids)
+    await journal.extend(broadcast_id, recipients.ids)
+    message_data = message_data_from_record(record)
+    logger.info("broadcast.auto_delivery", broadcast=broadcast_id, recipients=len(recipients))
+    # Некому показывать прогресс — итог только в журнале и логе
+    await run_broadcast(
+        broadcast_id, compile_broadcast(message_data), recipients, StatusPublisher(None, token_ttl=0),
+        priority=PRIORITY_NORMAL,
+        owner_id=record["owner_id"],
+        title=broadcast_title(message_data),
+        message_id=message_id,
+        followup=True
+    )
+    return True
+
+
+# ═══════════════════════════════════════════════════════════
+# 👥 ИНДЕКС УЧАСТНИКОВ
+# ═══════════════════════════════════════════════════════════
+
+# События с чужих серверов (бот может быть добавлен куда-то ещё) не индексируем.
+# Без кэша участников индекс не ведём вовсе: он был бы лишь списком вошедших после запуска
+
+@bot.event
+async def on_member_join(member: discord.Member):
+    if member.guild.id in GUILD_IDS:
+        if MEMBER_CACHE:
+            member_index.add(member)
+        if auto_deliveries and not member.bot:
+            queue_new_member(member)
+
+
+@bot.event
+async def on_member_remove(member: discord.Member):
+    if MEMBER_CACHE and member.guild.id in GUILD_IDS:
+        member_index.remove(member)
+
+
+@bot.event
+async def on_member_update(before: discord.Member, after: discord.Member):
+    if MEMBER_CACHE and after.guild.id in GUILD_IDS and before.roles != after.roles:
+        member_index.update_roles(before, after)
+
+
+@bot.event
+async def on_guild_role_delete(role: discord.Role):
+    if MEMBER_CACHE:
+        member_index.drop_role(role.guild.id, role.id)
 
 
 @bot.event
 async def on_ready():
-    global start_time
+    global start_time, ready_seconds, metrics_runner
     start_time = datetime.now()
+    if ready_seconds is None:
+        ready_seconds = time.monotonic() - PROCESS_STARTED
+    
+    # on_ready приходит и после переподключения — сервер метрик поднимаем один раз
+    if METRICS_PORT and metrics_runner is None:
+        try:
+            metrics_runner = await metrics.start_server(METRICS_PORT)
+            print(f"[METRICS] /metrics на порту {METRICS_PORT}")
+        except OSError as e:
+            print(f"[WARNING] Не удалось запустить эндпоинт метрик: {e}")
+    
+    # Строим индекс участников один раз, дальше его обновляют события
+    if MEMBER_CACHE:
+        for guild in broadcast_guilds():
+            member_index.rebuild(guild)
     
     # Устанавливаем статус "Играет в mc.peachmine.fun"
     await bot.change_presence(
@@ -444,10 +1706,36 @@ async def on_ready():
     print(f"  {PEACH_EMOJI} PeachMine » Рассылка")
     print(f"{'═'*50}")
     print(f"  Бот: {bot.user}")
-    print(f"  Сервер: {GUILD_ID}")
+    print(f"  Серверы: {', '.join(map(str, GUILD_IDS))}")
     print(f"  Админы: {ADMIN_IDS}")
+    print(f"  Кэш участников: {'вкл' if MEMBER_CACHE else 'выкл'}")
+    memory = rss_mb()
+    print(f"  Готов за: {ready_seconds:.1f} с, память: "
+          f"{f'{memory:.0f} МБ' if memory is not None else 'неизвестно'}")
     print(f"{'═'*50}\n")
     
+    # Запланированные рассылки переживают редеплой — ставим их на расписание снова
+    for record in await journal.scheduled():
+        if record["id"] not in scheduler.pending:
+            message_data = message_data_from_record(record)
+            arm_scheduled(record["id"], record["start_at"], record["priority"], broadcast_title(message_data),
+                          record["owner_id"], record["window"])
+    
+    # Досылка новым участникам тоже переживает редеплой
+    auto_deliveries.update(await journal.auto_deliveries())
+    await purge_broadcast_files()
+    
+    # Проверяем, не прервал ли редеплой рассылку
+    unfinished_note = ""
+    record = await journal.unfinished()
+    if record:
+        unfinished_note = (
+            f"\n\n♻️ Найдена прерванная рассылка **#{record['id']}** "
+            f"(`{record['processed']}/{record['total']}`)\n"
+            f"Продолжить: `/news mode:♻️ Продолжить прерванную`"
+        )
+        print(f"[JOURNAL] Прерванная рассылка #{record['id']}: {record['processed']}/{record['total']}")
+    
     # Отправляем уведомление о запуске админам
     try:
         for admin_id in ADMIN_IDS:
@@ -455,7 +1743,8 @@ async def on_ready():
             await admin.send(embed=create_embed(
                 "Бот запущен",
                 f"✅ **PeachMine » Рассылка** успешно запущен!\n\n"
-                f"🕐 Время: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}",
+                f"🕐 Время: {datetime.now().strftime('%d.%m.%Y %H:%M:%S')}"
+                f"{unfinished_note}",
                 SUCCESS_COLOR
             ))
     except Exception as e:
@@ -476,8 +1765,8 @@ if __name__ == "__main__":
         sys.exit(1)
     
     if not GUILD_ID:
-        print("❌ ОШИБКА: GUILD_ID не найден в переменных окружения!")
-        print("Убедись что переменная GUILD_ID установлена в Railway Variables")
+        print("❌ ОШИБКА: GUILD_IDS (или GUILD_ID) не найден в переменных окружения!")
+        print("Убедись что переменная GUILD_IDS установлена в Railway Variables")
         sys.exit(1)
     
     if not ADMIN_IDS:
@@ -491,3 +1780,9 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"❌ ОШИБКА при запуске бота: {e}")
         sys.exit(1)
+    finally:
+        # Дописываем результаты, накопленные с последнего сброса
+        journal.close()
+        dm_channels.close()
+        closed_dms.close()
+        logger.close()
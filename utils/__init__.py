@@ -0,0 +1,3 @@
+"""
+🍑 PeachMine » Рассылка — вспомогательные модули
+"""
@@ -0,0 +1,95 @@
+"""
+🍑 PeachMine » Рассылка — загрузка вложений рассылки
+
+Вложения исходного сообщения скачиваются параллельно и потоково. Всё
+крупнее порога пишется во временный файл и отдаётся как memoryview над
+mmap: байты не лежат в куче процесса, а aiohttp отправляет их без
+копирования в каждое ЛС. Файл удаляется сам, когда на буфер больше никто
+не ссылается. Слишком большие вложения не скачиваются вовсе.
+"""
+
+import asyncio
+import mmap
+import tempfile
+
+import aiohttp
+
+# Крупнее — во временный файл и mmap
+SPOOL_THRESHOLD = 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+DOWNLOAD_CONCURRENCY = 4
+DOWNLOAD_TIMEOUT = 120.0
+# Причина пропуска вложения больше лимита (у остальных — имя исключения загрузки)
+SKIP_TOO_LARGE = "too_large"
+
+
+def map_file(file) -> memoryview:
+    """Read-only memoryview над файлом; сам файл можно закрывать — mmap держит свой дескриптор"""
+    file.flush()
+    mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    file.close()
+    return memoryview(mapped)
+
+
+def spool_bytes(data: bytes):
+    """Крупные байты (например, из журнала при продолжении) — в mmap, мелкие как есть"""
+    if len(data) <= SPOOL_THRESHOLD:
+        return data
+    spool = tempfile.TemporaryFile(prefix="peachmine-")
+    spool.write(data)
+    return map_file(spool)
+
+
+async def _download(session: aiohttp.ClientSession, attachment, limit: asyncio.Semaphore,
+                    spool_threshold: int):
+    async with limit, session.get(attachment.url) as response:
+        response.raise_for_status()
+        if attachment.size <= spool_threshold:
+            return await response.read()
+        # Временный файл без имени (на Linux удалён сразу) — исчезнет вместе с mmap
+        spool = tempfile.TemporaryFile(prefix="peachmine-")
+        try:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                await asyncio.to_thread(spool.write, chunk)
+            if spool.tell() == 0:
+                spool.close()
+                return b""
+            return map_file(spool)
+        except BaseException:
+            spool.close()
+            raise
+
+
+async def prefetch(attachments, *, max_size: int, spool_threshold: int = SPOOL_THRESHOLD,
+                   concurrency: int = DOWNLOAD_CONCURRENCY, cache=None) -> tuple:
+    """
+    Скачивает вложения параллельно. Возвращает `(files, skipped, ids)`:
+    files — [(имя, bytes | memoryview)] в исходном порядке, skipped —
+    [(имя, причина)] для тех, что больше `max_size` или не скачались,
+    ids — ID вложений, попавших в files.
+    `cache` (PayloadCache) — уже скачанные вложения берутся из него по ID.
+    """
+    attachments = list(attachments)
+    wanted = [a for a in attachments if a.size <= max_size]
+    skipped = [(a.filename, SKIP_TOO_LARGE) for a in attachments if a.size > max_size]
+    cached = {a.id: cache.get_file(a.id) for a in wanted} if cache is not None else {}
+    missing = [a for a in wanted if cached.get(a.id) is None]
+
+    if missing:
+        limit = asyncio.Semaphore(concurrency)
+        timeout = aiohttp.ClientTimeout(total=DOWNLOAD_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            results = await asyncio.gather(
+                *(_download(session, a, limit, spool_threshold) for a in missing),
+                return_exceptions=True
+            )
+        for attachment, result in zip(missing, results):
+            if isinstance(result, BaseException):
+                skipped.append((attachment.filename, type(result).__name__))
+                continue
+            cached[attachment.id] = result
+            if cache is not None:
+                cache.put_file(attachment.id, result)
+
+    ready = [a for a in wanted if cached.get(a.id) is not None]
+    return [(a.filename, cached[a.id]) for a in ready], skipped, tuple(a.id for a in ready)
@@ -0,0 +1,304 @@
+"""
+🍑 PeachMine » Рассылка — диспетчер рассылки
+
+Пул параллельных отправителей с общим token bucket. Скорость подстраивается
+под ответы Discord: заголовки X-RateLimit-* и retry_after из 429 вместо
+фиксированной паузы между сообщениями. Временные ошибки возвращаются в
+конец очереди после задержки (см. retry.py) и не занимают воркер, а
+получатели, исчерпавшие повторы, уходят в dead letter.
+"""
+
+import asyncio
+import time
+
+from . import metrics
+from .journal import STATUS_PENDING
+from .recipients import RecipientList
+from .retry import (MAX_TRANSIENT_RETRIES, RETRY_RATE_LIMITED, RETRY_TRANSIENT, backoff,
+                    classify_exception, classify_response)
+
+# Итоги отправки одному получателю
+OUTCOME_OK = "ok"
+OUTCOME_FORBIDDEN = "forbidden"
+OUTCOME_ERROR = "error"
+# Повторы исчерпаны — получателя можно переотправить позже (/broadcast replay)
+OUTCOME_DEAD_LETTER = "dead_letter"
+
+# «Cannot send messages to this user» — ЛС закрыты. Другие 403 (нет доступа,
+# антиспам против бота) о получателе ничего не говорят и считаются ошибкой
+DM_CLOSED_CODE = 50007
+
+# Сколько раз повторяем получателя после 429, прежде чем сдаться
+MAX_RATE_LIMIT_RETRIES = 5
+
+# Сколько получателей из потокового источника держим в очереди на воркера
+STREAM_BACKLOG_PER_WORKER = 50
+
+
+class TokenBucket:
+    """Адаптивный token bucket: снижает скорость на 429 и плавно восстанавливает"""
+
+    def __init__(self, rate: float, capacity: float = None, min_rate: float = 0.2):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Ждёт свободный токен (FIFO — ожидающие не обгоняют друг друга)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Останавливает выдачу токенов на указанное время"""
+        now = time.monotonic()
+        self._blocked_until = max(self._blocked_until, now + seconds)
+        self._tokens = 0
+        self._updated = max(now, self._blocked_until)
+
+    def on_rate_limited(self, retry_after: float):
+        """429: ждём retry_after и вдвое снижаем скорость"""
+        self.pause(retry_after)
+        self.rate = max(self.min_rate, self.rate / 2)
+
+    def on_success(self, remaining: int = None, reset_after: float = None):
+        """Успешный ответ: учитываем заголовки и понемногу разгоняемся"""
+        if remaining == 0 and reset_after:
+            self.pause(reset_after)
+        self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+class BroadcastDispatcher:
+    """
+    Рассылает по списку получателей пулом из `concurrency` воркеров.
+
+    `send(recipient)` должна вернуть RestResponse (или объект с теми же
+    полями). `on_result(recipient, outcome, detail)` вызывается после
+    каждого окончательного результата. `track_metrics=False` — не
+    учитывать отправки в метриках (например, для прогрева ЛС).
+    `bucket` — общий лимитер вместо собственного TokenBucket(rate), если
+    скорость делится с другими рассылками.
+
+    RecipientList подаётся в очередь по индексам с тем же ограничением
+    backlog, что и поток, а итог каждого получателя пишется в его байт
+    статуса — уже обработанные (status != pending) пропускаются.
+
+    Получатель с временной ошибкой ждёт backoff() вне очереди и потом
+    встаёт в её конец; run() завершается, только когда и очередь, и
+    отложенные повторы пусты.
+    """
+
+    def __init__(self, send, *, concurrency: int = 4, rate: float = 2.0,
+                 on_result=None, track_metrics: bool = True, bucket=None):
+        self.send = send
+        self.concurrency = max(1, concurrency)
+        self.bucket = bucket or TokenBucket(rate)
+        self.on_result = on_result
+        self.track_metrics = track_metrics
+        self.stats = {"success": 0, "failed": 0, "forbidden": 0, "rate_limited": 0,
+                      "retried": 0, "dead_letter": 0, "total": 0}
+        self.cancelled = False
+        self._queue = asyncio.Queue()
+        self._backlog = self.concurrency * STREAM_BACKLOG_PER_WORKER
+        # Воркеры будят подающего, когда очередь опустилась ниже backlog
+        self._has_room = asyncio.Event()
+        self._recipients = None
+        # Отложенные повторы: handle call_later → получатель
+        self._delayed = {}
+        self._released = asyncio.Event()
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._resumed.is_set()
+
+    def pause(self):
+        """Воркеры доделывают текущие отправки и ждут resume()"""
+        self._resumed.clear()
+
+    def resume(self):
+        self._resumed.set()
+
+    def cancel(self):
+        """Оставшиеся получатели пропускаются без on_result — в журнале они остаются в ожидании"""
+        self.cancelled = True
+        self._resumed.set()
+        for handle in self._delayed:
+            handle.cancel()
+        self._delayed.clear()
+        self._released.set()
+
+    async def run(self, recipients) -> dict:
+        """
+        Запускает рассылку и ждёт её завершения. `recipients` — обычный
+        итерируемый объект, RecipientList или асинхронный (получатели
+        подгружаются по ходу).
+        """
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        try:
+            if isinstance(recipients, RecipientList):
+                await self._feed_list(recipients)
+            elif hasattr(recipients, "__aiter__"):
+                await self._feed_stream(recipients)
+            else:
+                for recipient in recipients:
+                    self._put(recipient, 0)
+                    self.stats["total"] += 1
+            await self._queue.join()
+            # Очередь пуста, но кто-то ещё ждёт повтора — дожидаемся и его
+            while self._delayed:
+                self._released.clear()
+                await self._released.wait()
+                await self._queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+        return self.stats
+
+    async def _wait_backlog(self):
+        # Не читаем источник сильно впереди отправки — память не растёт
+        while self._queue.qsize() >= self._backlog:
+            self._has_room.clear()
+            await self._has_room.wait()
+
+    async def _feed_stream(self, recipients):
+        async for recipient in recipients:
+            if self.cancelled:
+                break
+            await self._wait_backlog()
+            self._put(recipient, 0)
+            self.stats["total"] += 1
+
+    async def _feed_list(self, recipients: RecipientList):
+        self._recipients = recipients
+        self.stats["total"] = recipients.pending()
+        status = recipients.status
+        for slot, user_id in enumerate(recipients.ids):
+            if self.cancelled:
+                break
+            if status[slot] != STATUS_PENDING:
+                continue
+            await self._wait_backlog()
+            self._put(user_id, 0, slot)
+
+    def _put(self, recipient, attempt: int, slot: int = None):
+        self._queue.put_nowait((recipient, attempt, slot))
+        if self.track_metrics:
+            metrics.QUEUE_DEPTH.inc()
+
+    def _put_later(self, recipient, attempt: int, slot: int, delay: float):
+        loop = asyncio.get_running_loop()
+        handle = None
+
+        def release():
+            self._delayed.pop(handle, None)
+            if not self.cancelled:
+                self._put(recipient, attempt, slot)
+            self._released.set()
+
+        handle = loop.call_later(delay, release)
+        self._delayed[handle] = recipient
+
+    async def _worker(self):
+        while True:
+            recipient, attempt, slot = await self._queue.get()
+            if self._queue.qsize() < self._backlog:
+                self._has_room.set()
+            if self.track_metrics:
+                metrics.QUEUE_DEPTH.dec()
+            try:
+                await self._process(recipient, attempt, slot)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, recipient, attempt: int, slot: int = None):
+        await self._resumed.wait()
+        if self.cancelled:
+            return
+        await self.bucket.acquire()
+        if self.cancelled:
+            return
+        started = time.monotonic()
+        try:
+            response = await self.send(recipient)
+        except Exception as e:
+            detail = str(e) or type(e).__name__
+            if classify_exception(e) == RETRY_TRANSIENT:
+                await self._retry(recipient, attempt, detail, started, slot)
+            else:
+                await self._finish(recipient, OUTCOME_ERROR, detail, started, slot)
+            return
+
+        if response.ok:
+            self.bucket.on_success(response.remaining, response.reset_after)
+            await self._finish(recipient, OUTCOME_OK, None, started, slot)
+            return
+
+        kind = classify_response(response)
+        if kind == RETRY_RATE_LIMITED:
+            self.stats["rate_limited"] += 1
+            self.bucket.on_rate_limited(response.retry_after)
+            if self.track_metrics:
+                metrics.RATE_LIMITED.inc("global" if response.is_global else "route")
+                metrics.RATE_LIMIT.set(self.bucket.rate)
+            if attempt < MAX_RATE_LIMIT_RETRIES:
+                # В конец очереди — остальные воркеры тоже подождут паузу bucket'а
+                self._put(recipient, attempt + 1, slot)
+                self._count_retry()
+                return
+            await self._finish(recipient, OUTCOME_DEAD_LETTER, "rate limited", started, slot)
+        elif response.status == 403 and response.code == DM_CLOSED_CODE:
+            await self._finish(recipient, OUTCOME_FORBIDDEN, response.code, started, slot)
+        elif kind == RETRY_TRANSIENT:
+            await self._retry(recipient, attempt, f"HTTP {response.status}", started, slot)
+        else:
+            await self._finish(recipient, OUTCOME_ERROR, f"HTTP {response.status}: {response.data}", started, slot)
+
+    async def _retry(self, recipient, attempt: int, detail: str, started: float, slot: int):
+        """Временная ошибка: повтор после backoff() или dead letter, если попытки кончились"""
+        if attempt >= MAX_TRANSIENT_RETRIES:
+            await self._finish(recipient, OUTCOME_DEAD_LETTER, detail, started, slot)
+            return
+        self._put_later(recipient, attempt + 1, slot, backoff(attempt))
+        self._count_retry()
+
+    def _count_retry(self):
+        self.stats["retried"] += 1
+        if self.track_metrics:
+            metrics.RETRIES.inc()
+
+    async def _finish(self, recipient, outcome: str, detail, started: float, slot: int = None):
+        if slot is not None:
+            self._recipients.mark(slot, outcome)
+        if self.track_metrics:
+            metrics.observe_send(outcome, time.monotonic() - started)
+            metrics.RATE_LIMIT.set(self.bucket.rate)
+        if outcome == OUTCOME_OK:
+            self.stats["success"] += 1
+        else:
+            self.stats["failed"] += 1
+            if outcome == OUTCOME_FORBIDDEN:
+                self.stats["forbidden"] += 1
+            elif outcome == OUTCOME_DEAD_LETTER:
+                self.stats["dead_letter"] += 1
+        if self.on_result is not None:
+            await self.on_result(recipient, outcome, detail)
@@ -0,0 +1,29 @@
+"""
+🍑 PeachMine » Рассылка — кэш ЛС-каналов
+
+ID ЛС-канала с пользователем не меняется, поэтому его достаточно получить
+один раз. Кэш живёт в памяти и сохраняется на диск пачками, так что
+отправка ЛС — это один POST в известный канал без предварительного
+запроса на открытие ЛС.
+"""
+
+from .dispatcher import BroadcastDispatcher
+from .store import PersistentDict
+
+
+class DMChannelCache(PersistentDict):
+    """ID ЛС-каналов по ID пользователя: в памяти и на диске"""
+
+    table = "dm_channels"
+    value_column = "channel_id"
+
+    async def prewarm(self, transport, user_ids, concurrency: int = 4, rate: float = 2.0,
+                      bucket=None) -> int:
+        """Параллельно открывает ЛС с теми, кого ещё нет в кэше. Возвращает число открытых"""
+        missing = [uid for uid in user_ids if uid not in self._data]
+        if not missing:
+            return 0
+        dispatcher = BroadcastDispatcher(transport.open_dm, concurrency=concurrency, rate=rate,
+                                         track_metrics=False, bucket=bucket)
+        stats = await dispatcher.run(missing)
+        return stats["success"]
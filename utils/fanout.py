@@ -0,0 +1,168 @@
+"""
+🍑 PeachMine » Рассылка — раздача вложений по ссылкам
+
+Вместо того чтобы заново загружать байты вложений в каждое ЛС, файлы
+загружаются один раз (в служебный канал или вместе с первым успешным ЛС),
+а дальше в сообщения подставляются ссылки на CDN Discord.
+"""
+
+import asyncio
+import time
+from urllib.parse import quote
+
+from .limits import validate
+from .log import logger
+from .payload import CompiledPayload
+
+# Режимы раздачи вложений
+FANOUT_OFF = "off"
+FANOUT_FIRST = "first"
+FANOUT_STAGING = "staging"
+FANOUT_MODES = (FANOUT_OFF, FANOUT_FIRST, FANOUT_STAGING)
+
+# Подписанные ссылки CDN живут ~24 часа — перезагружаем заранее
+DEFAULT_REFERENCE_TTL = 20 * 3600
+# Длина ссылки CDN без имени файла с запасом: сейчас это ~180 символов
+# (https://cdn.discordapp.com/attachments/<канал>/<вложение>/…?ex=…&is=…&hm=<64>&)
+CDN_URL_OVERHEAD = 256
+
+
+def extract_references(message: dict) -> list:
+    """Достаёт ссылки на вложения из ответа Discord на создание сообщения"""
+    return [
+        {
+            "filename": a.get("filename"),
+            "url": a.get("url"),
+            "content_type": a.get("content_type") or "",
+            "size": a.get("size", 0),
+        }
+        for a in message.get("attachments", [])
+    ]
+
+
+def apply_references(payload: dict, references: list) -> dict:
+    """
+    Подставляет ссылки вместо файлов: первая картинка становится
+    картинкой embed'а, остальное — ссылками в тексте (Discord сам
+    развернёт превью).
+    """
+    payload = dict(payload)  # payload может быть и read-only отображением
+    links = []
+    embeds = [dict(e) for e in payload.get("embeds", [])]
+    for ref in references:
+        if ref["content_type"].startswith("image/") and embeds and "image" not in embeds[0]:
+            embeds[0]["image"] = {"url": ref["url"]}
+        else:
+            links.append(ref["url"])
+    if embeds:
+        payload["embeds"] = embeds
+    if links:
+        payload["content"] = "\n".join(filter(None, [payload.get("content")] + links))
+    return payload
+
+
+def referenced_payload(payload: CompiledPayload, references: list):
+    """Сообщение со ссылками вместо файлов или None, если оно не влезает в лимиты Discord"""
+    data = apply_references(payload.data, references)
+    if validate(data):
+        return None
+    return CompiledPayload(data)
+
+
+def reference_problems(payload: CompiledPayload) -> list:
+    """Что превысит лимиты, когда файлы станут ссылками: худший случай — все ссылки в тексте"""
+    references = [
+        {"filename": name, "url": "x" * (CDN_URL_OVERHEAD + len(quote(name))), "content_type": "", "size": len(data)}
+        for name, data in payload.files
+    ]
+    return validate(apply_references(payload.data, references))
+
+
+class AttachmentFanout:
+    """Однократная загрузка вложений рассылки и раздача ссылок на них"""
+
+    def __init__(self, transport, mode: str = FANOUT_FIRST, staging_channel_id: int = None,
+                 ttl: float = DEFAULT_REFERENCE_TTL):
+        if mode == FANOUT_STAGING and not staging_channel_id:
+            mode = FANOUT_FIRST
+        self.transport = transport
+        self.mode = mode
+        self.staging_channel_id = staging_channel_id
+        self.ttl = ttl
+        self.references = None
+        self.uploaded_bytes = 0
+        self._referenced = None
+        self._uploaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != FANOUT_OFF
+
+    @property
+    def uploaded_at(self) -> float:
+        return self._uploaded_at
+
+    def _fresh(self) -> bool:
+        return self.references is not None and time.monotonic() - self._uploaded_at < self.ttl
+
+    def seed(self, references: list, uploaded_at: float, payload: CompiledPayload) -> bool:
+        """Берёт ссылки от прошлой рассылки тех же файлов, если они ещё живы"""
+        if not self.enabled or len(references) != len(payload.files):
+            return False
+        if time.monotonic() - uploaded_at >= self.ttl:
+            return False
+        return self._use(references, uploaded_at, payload)
+
+    def _use(self, references: list, uploaded_at: float, payload: CompiledPayload) -> bool:
+        referenced = referenced_payload(payload, references)
+        if referenced is None:
+            # Ссылки не влезли в текст — до конца рассылки шлём сами файлы
+            logger.warning("broadcast.references_too_long", files=len(references))
+            self.mode = FANOUT_OFF
+            return False
+        self.references = references
+        self._referenced = referenced
+        self._uploaded_at = uploaded_at
+        return True
+
+    def _adopt(self, response, payload: CompiledPayload):
+        if response.ok and isinstance(response.data, dict):
+            references = extract_references(response.data)
+            if len(references) == len(payload.files):
+                self._use(references, time.monotonic(), payload)
+        self.uploaded_bytes += payload.upload_size
+
+    async def send_dm(self, user_id: int, payload: CompiledPayload):
+        """Отправляет ЛС, загружая байты вложений только если ссылок ещё нет"""
+        files = payload.files
+        if not files or not self.enabled:
+            self.uploaded_bytes += payload.upload_size
+            return await self.transport.send_dm(user_id, payload.body, files or None)
+
+        if not self._fresh():
+            # Пока одна отправка загружает файлы, остальные ждут готовых ссылок
+            async with self._lock:
+                if not self._fresh() and self.enabled:
+                    if self.mode == FANOUT_STAGING:
+                        response = await self.transport.send_message(
+                            self.staging_channel_id,
+                            {"content": "📎 Вложения рассылки PeachMine"},
+                            files
+                        )
+                        self._adopt(response, payload)
+                        if not response.ok:
+                            # Нет доступа к служебному каналу — грузим через первое ЛС
+                            logger.warning("broadcast.staging_unavailable", channel=self.staging_channel_id,
+                                           status=response.status)
+                            self.mode = FANOUT_FIRST
+                    else:
+                        response = await self.transport.send_dm(user_id, payload.body, files)
+                        self._adopt(response, payload)
+                        return response
+
+        if not self._fresh():
+            # Загрузить не удалось — шлём по-старому
+            self.uploaded_bytes += payload.upload_size
+            return await self.transport.send_dm(user_id, payload.body, files)
+        return await self.transport.send_dm(user_id, self._referenced.body)
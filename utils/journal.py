@@ -0,0 +1,511 @@
+"""
+🍑 PeachMine » Рассылка — журнал рассылок
+
+SQLite в режиме WAL: для каждой рассылки хранится само сообщение и итог
+по каждому получателю. Результаты копятся в памяти и пишутся пачками из
+отдельного потока, так что на горячем пути нет ни fsync, ни блокирующих
+вызовов. После редеплоя незавершённую рассылку можно продолжить только
+по тем, кому сообщение ещё не ушло. Получатели, исчерпавшие повторы
+временных ошибок, попадают в dead_letters и переотправляются отдельно.
+По message_id исходного сообщения журнал знает, кому оно уже доставлено
+(см. ledger.py).
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+# Статусы получателя в журнале
+STATUS_PENDING = 0
+STATUS_OK = 1
+STATUS_FORBIDDEN = 2
+STATUS_ERROR = 3
+# Временная ошибка (5xx, таймаут, 429), повторы исчерпаны — стоит переотправить
+STATUS_TRANSIENT = 4
+
+OUTCOME_STATUS = {
+    "ok": STATUS_OK,
+    "forbidden": STATUS_FORBIDDEN,
+    "error": STATUS_ERROR,
+    "dead_letter": STATUS_TRANSIENT,
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS broadcasts (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at  REAL NOT NULL,
+    finished_at REAL,
+    state       TEXT NOT NULL DEFAULT 'running',
+    content     TEXT,
+    embeds      TEXT NOT NULL DEFAULT '[]',
+    source_url  TEXT,
+    total       INTEGER NOT NULL DEFAULT 0,
+    start_at    REAL,
+    window_sec  REAL,
+    priority    TEXT NOT NULL DEFAULT 'normal',
+    owner_id    INTEGER,
+    segment     TEXT,
+    message_id  INTEGER,
+    replay_state TEXT,
+    files_purged INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS broadcast_files (
+    broadcast_id INTEGER NOT NULL,
+    position     INTEGER NOT NULL,
+    filename     TEXT NOT NULL,
+    data         BLOB NOT NULL,
+    PRIMARY KEY (broadcast_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS recipients (
+    broadcast_id INTEGER NOT NULL,
+    user_id      INTEGER NOT NULL,
+    status       INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (broadcast_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS dead_letters (
+    broadcast_id INTEGER NOT NULL,
+    user_id      INTEGER NOT NULL,
+    error        TEXT,
+    failed_at    REAL NOT NULL,
+    PRIMARY KEY (broadcast_id, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS auto_deliveries (
+    broadcast_id INTEGER PRIMARY KEY,
+    message_id   INTEGER NOT NULL,
+    created_at   REAL NOT NULL
+);
+"""
+
+# Индексы по колонкам из MIGRATIONS — создаются после миграции
+INDEXES = """
+CREATE INDEX IF NOT EXISTS broadcasts_message ON broadcasts (message_id);
+"""
+
+# Колонки, добавленные после первой версии схемы (для уже существующих БД)
+MIGRATIONS = {
+    "broadcasts": [
+        ("start_at", "REAL"),
+        ("window_sec", "REAL"),
+        ("priority", "TEXT NOT NULL DEFAULT 'normal'"),
+        ("owner_id", "INTEGER"),
+        ("segment", "TEXT"),
+        ("message_id", "INTEGER"),
+        ("replay_state", "TEXT"),
+        ("files_purged", "INTEGER NOT NULL DEFAULT 0"),
+    ],
+}
+
+BROADCAST_COLUMNS = ("id, created_at, content, embeds, source_url, total, state, "
+                     "start_at, window_sec, priority, owner_id, segment, message_id, replay_state, files_purged")
+
+
+class BroadcastJournal:
+    """Журнал рассылок с пакетной записью результатов"""
+
+    def __init__(self, path: str, flush_interval: float = 2.0, batch_size: int = 500):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        # В WAL режиме NORMAL не делает fsync на каждый коммит
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._migrate()
+        self._db.executescript(INDEXES)
+        self._db.commit()
+
+        # Все обращения к БД идут через один поток
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="journal")
+        self._buffer = []
+        self._dead = []
+        self._full = asyncio.Event()
+        self._flusher = None
+
+    def _migrate(self):
+        for table, columns in MIGRATIONS.items():
+            existing = {row[1] for row in self._db.execute(f"PRAGMA table_info({table})")}
+            for name, definition in columns:
+                if name not in existing:
+                    self._db.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # ─── Запись ───────────────────────────────────────────────
+
+    async def start(self, content: str, embeds: list, files: list, user_ids,
+                    source_url: str = None, total: int = None, *, state: str = "running",
+                    start_at: float = None, window: float = None, priority: str = "normal",
+                    owner_id: int = None, segment: dict = None, message_id: int = None) -> int:
+        """
+        Создаёт рассылку со всеми получателями в статусе pending. Для
+        потоковой рассылки список пуст, а получатели добавляются по мере
+        отправки — `total` тогда оценка. Запланированная рассылка
+        (state="scheduled") получает получателей в activate() при старте.
+        `segment` — фильтр по ролям (Segment.to_dict()), `message_id` —
+        исходное сообщение (для учёта доставок).
+        """
+        # Копия в array('Q'): поток журнала читает её, пока рассылка идёт
+        user_ids = array("Q", user_ids)
+        return await self._run(self._start_sync, content, embeds, files, user_ids, source_url,
+                               len(user_ids) if total is None else total,
+                               (state, start_at, window, priority, owner_id,
+                                json.dumps(segment) if segment else None, message_id))
+
+    def _start_sync(self, content, embeds, files, user_ids: array, source_url, total, schedule) -> int:
+        with self._db:
+            cursor = self._db.execute(
+                "INSERT INTO broadcasts (created_at, content, embeds, source_url, total, "
+                "state, start_at, window_sec, priority, owner_id, segment, message_id) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (time.time(), content, json.dumps(embeds, ensure_ascii=False),
+                 source_url, total, *schedule)
+            )
+            broadcast_id = cursor.lastrowid
+            self._db.executemany(
+                "INSERT INTO broadcast_files (broadcast_id, position, filename, data) "
+                "VALUES (?, ?, ?, ?)",
+                [(broadcast_id, i, name, data) for i, (name, data) in enumerate(files)]
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO recipients (broadcast_id, user_id) VALUES (?, ?)",
+                ((broadcast_id, uid) for uid in user_ids)
+            )
+        return broadcast_id
+
+    async def activate(self, broadcast_id: int, user_ids, total: int = None):
+        """Запланированная рассылка стартует: фиксируем получателей на момент старта"""
+        user_ids = array("Q", user_ids)
+        await self._run(self._activate_sync, broadcast_id, user_ids,
+                        len(user_ids) if total is None else total)
+
+    def _activate_sync(self, broadcast_id: int, user_ids: array, total: int):
+        with self._db:
+            self._db.execute(
+                "UPDATE broadcasts SET state = 'running', total = ? WHERE id = ?",
+                (total, broadcast_id)
+            )
+            self._db.executemany(
+                "INSERT OR IGNORE INTO recipients (broadcast_id, user_id) VALUES (?, ?)",
+                ((broadcast_id, uid) for uid in user_ids)
+            )
+
+    async def extend(self, broadcast_id: int, user_ids):
+        """Досылка завершённой рассылки новым получателям: снова running, total растёт"""
+        user_ids = array("Q", user_ids)
+        await self._run(self._extend_sync, broadcast_id, user_ids)
+
+    def _extend_sync(self, broadcast_id: int, user_ids: array):
+        with self._db:
+            cursor = self._db.executemany(
+                "INSERT OR IGNORE INTO recipients (broadcast_id, user_id) VALUES (?, ?)",
+                ((broadcast_id, uid) for uid in user_ids)
+            )
+            self._db.execute(
+                "UPDATE broadcasts SET state = 'running', total = total + ? WHERE id = ?",
+                (cursor.rowcount, broadcast_id)
+            )
+
+    async def reopen(self, broadcast_id: int):
+        """
+        Повтор завершённой рассылки: снова running, чтобы прерванный повтор
+        был виден после редеплоя. Прежнее состояние (done или cancelled)
+        запоминается в replay_state, и finish() вернёт его.
+        """
+        await self._run(self._reopen_sync, broadcast_id)
+
+    def _reopen_sync(self, broadcast_id: int):
+        with self._db:
+            self._db.execute(
+                "UPDATE broadcasts SET replay_state = COALESCE(replay_state, state), "
+                "state = 'running', finished_at = NULL WHERE id = ?", (broadcast_id,)
+            )
+
+    def record(self, broadcast_id: int, user_id: int, outcome: str):
+        """Запоминает итог отправки (без обращения к диску)"""
+        self._buffer.append((OUTCOME_STATUS[outcome], broadcast_id, user_id))
+        if len(self._buffer) >= self.batch_size:
+            self._full.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    def dead_letter(self, broadcast_id: int, user_id: int, error: str = None):
+        """Получатель исчерпал повторы — пишется вместе со следующей пачкой результатов"""
+        self._dead.append((broadcast_id, user_id, error, time.time()))
+
+    async def _flush_loop(self):
+        # Пишем раз в flush_interval или сразу, как только набралась пачка
+        while self._buffer:
+            try:
+                await asyncio.wait_for(self._full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Сбрасывает накопленные результаты одной транзакцией"""
+        if not self._buffer and not self._dead:
+            return
+        batch, self._buffer = self._buffer, []
+        dead, self._dead = self._dead, []
+        await self._run(self._write_batch, batch, dead)
+
+    def _write_batch(self, batch: list, dead: list = ()):
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO recipients (status, broadcast_id, user_id) VALUES (?, ?, ?) "
+                "ON CONFLICT (broadcast_id, user_id) DO UPDATE SET status = excluded.status",
+                batch
+            )
+            self._db.executemany(
+                "INSERT OR REPLACE INTO dead_letters (broadcast_id, user_id, error, failed_at) "
+                "VALUES (?, ?, ?, ?)",
+                dead
+            )
+
+    async def finish(self, broadcast_id: int, state: str = "done"):
+        """Рассылка закончилась; после повтора — прежнее состояние из replay_state, а не `state`"""
+        await self.flush()
+        await self._run(self._finish_sync, broadcast_id, state)
+
+    def _finish_sync(self, broadcast_id: int, state: str):
+        with self._db:
+            self._db.execute(
+                "UPDATE broadcasts SET state = COALESCE(replay_state, ?), replay_state = NULL, "
+                "finished_at = ? WHERE id = ?",
+                (state, time.time(), broadcast_id)
+            )
+
+    # ─── Чтение ───────────────────────────────────────────────
+
+    async def unfinished(self):
+        """Последняя незавершённая рассылка (или None)"""
+        return await self._run(self._unfinished_sync)
+
+    def _unfinished_sync(self):
+        row = self._db.execute(
+            f"SELECT {BROADCAST_COLUMNS} FROM broadcasts "
+            "WHERE state = 'running' ORDER BY id DESC LIMIT 1"
+        ).fetchone()
+        return self._load(row) if row is not None else None
+
+    async def get(self, broadcast_id: int):
+        """Рассылка по ID (или None)"""
+        return await self._run(self._get_sync, broadcast_id)
+
+    def _get_sync(self, broadcast_id: int):
+        row = self._db.execute(
+            f"SELECT {BROADCAST_COLUMNS} FROM broadcasts WHERE id = ?", (broadcast_id,)
+        ).fetchone()
+        return self._load(row) if row is not None else None
+
+    async def scheduled(self) -> list:
+        """Запланированные и ещё не начатые рассылки (для восстановления после редеплоя)"""
+        return await self._run(self._scheduled_sync)
+
+    def _scheduled_sync(self) -> list:
+        rows = self._db.execute(
+            f"SELECT {BROADCAST_COLUMNS} FROM broadcasts "
+            "WHERE state = 'scheduled' ORDER BY start_at"
+        ).fetchall()
+        # Вложения понадобятся только при старте — его запись читается заново через get()
+        return [self._load(row, with_files=False) for row in rows]
+
+    def _load(self, row, with_files: bool = True) -> dict:
+        (broadcast_id, created_at, content, embeds, source_url, total, state,
+         start_at, window, priority, owner_id, segment, message_id, replay_state, files_purged) = row
+        files = self._db.execute(
+            "SELECT filename, data FROM broadcast_files WHERE broadcast_id = ? ORDER BY position",
+            (broadcast_id,)
+        ).fetchall() if with_files else []
+        processed = self._db.execute(
+            "SELECT COUNT(*) FROM recipients WHERE broadcast_id = ? AND status != ?",
+            (broadcast_id, STATUS_PENDING)
+        ).fetchone()[0]
+        return {
+            "id": broadcast_id,
+            "created_at": created_at,
+            "content": content,
+            "embeds": json.loads(embeds),
+            "files": [(name, bytes(data)) for name, data in files],
+            "source_url": source_url,
+            "total": total,
+            "processed": processed,
+            "state": state,
+            "start_at": start_at,
+            "window": window,
+            "priority": priority,
+            "owner_id": owner_id,
+            "segment": json.loads(segment) if segment else None,
+            "message_id": message_id,
+            "replay_state": replay_state,
+            "files_purged": bool(files_purged),
+        }
+
+    async def purge_files(self, finished_before: float) -> int:
+        """
+        Удаляет вложения рассылок, завершённых раньше `finished_before`,
+        кроме тех, что ещё досылаются новым участникам. Возвращает, у
+        скольких рассылок удалены вложения.
+        """
+        return await self._run(self._purge_files_sync, finished_before)
+
+    def _purge_files_sync(self, finished_before: float) -> int:
+        with self._db:
+            cursor = self._db.execute(
+                "UPDATE broadcasts SET files_purged = 1 "
+                "WHERE state IN ('done', 'cancelled') AND finished_at < ? AND files_purged = 0 "
+                "AND id NOT IN (SELECT broadcast_id FROM auto_deliveries) "
+                "AND id IN (SELECT broadcast_id FROM broadcast_files)",
+                (finished_before,)
+            )
+            self._db.execute(
+                "DELETE FROM broadcast_files WHERE broadcast_id IN "
+                "(SELECT id FROM broadcasts WHERE files_purged = 1)"
+            )
+        return cursor.rowcount
+
+    async def pending_recipients(self, broadcast_id: int) -> array:
+        """ID получателей, которым сообщение ещё не отправлялось"""
+        return await self._run(self._pending_sync, broadcast_id)
+
+    def _pending_sync(self, broadcast_id: int) -> array:
+        rows = self._db.execute(
+            "SELECT user_id FROM recipients WHERE broadcast_id = ? AND status = ?",
+            (broadcast_id, STATUS_PENDING)
+        )
+        return array("Q", (uid for (uid,) in rows))
+
+    async def processed_recipients(self, broadcast_id: int) -> set:
+        """ID получателей, по которым уже есть итог (для потоковой рассылки)"""
+        return await self._run(self._processed_sync, broadcast_id)
+
+    def _processed_sync(self, broadcast_id: int) -> set:
+        rows = self._db.execute(
+            "SELECT user_id FROM recipients WHERE broadcast_id = ? AND status != ?",
+            (broadcast_id, STATUS_PENDING)
+        )
+        return {uid for (uid,) in rows}
+
+    async def outcomes(self, broadcast_id: int) -> tuple:
+        """Итог по всем получателям рассылки: (ID в array('Q'), статусы в bytearray)"""
+        await self.flush()
+        return await self._run(self._outcomes_sync, broadcast_id)
+
+    def _outcomes_sync(self, broadcast_id: int) -> tuple:
+        ids = array("Q")
+        status = bytearray()
+        for uid, st in self._db.execute(
+            "SELECT user_id, status FROM recipients WHERE broadcast_id = ?", (broadcast_id,)
+        ):
+            ids.append(uid)
+            status.append(st)
+        return ids, status
+
+    async def dead_letters(self, broadcast_id: int) -> list:
+        """
+        ID получателей из dead letter рассылки. Кому повторная отправка
+        уже удалась (например, прерванный replay), из очереди убираются.
+        """
+        await self.flush()
+        return await self._run(self._dead_letters_sync, broadcast_id)
+
+    def _dead_letters_sync(self, broadcast_id: int) -> list:
+        with self._db:
+            self._db.execute(
+                "DELETE FROM dead_letters WHERE broadcast_id = ? AND user_id IN "
+                "(SELECT user_id FROM recipients WHERE broadcast_id = ? AND status IN (?, ?))",
+                (broadcast_id, broadcast_id, STATUS_OK, STATUS_FORBIDDEN)
+            )
+        rows = self._db.execute(
+            "SELECT user_id FROM dead_letters WHERE broadcast_id = ? ORDER BY failed_at",
+            (broadcast_id,)
+        )
+        return [uid for (uid,) in rows]
+
+    async def dead_letter_counts(self) -> list:
+        """[(broadcast_id, число, последняя ошибка)] по рассылкам с непустым dead letter"""
+        return await self._run(self._dead_letter_counts_sync)
+
+    def _dead_letter_counts_sync(self) -> list:
+        return self._db.execute(
+            "SELECT broadcast_id, COUNT(*), "
+            "(SELECT error FROM dead_letters d2 WHERE d2.broadcast_id = d.broadcast_id "
+            " ORDER BY failed_at DESC LIMIT 1) "
+            "FROM dead_letters d GROUP BY broadcast_id ORDER BY broadcast_id DESC"
+        ).fetchall()
+
+    async def resolve_dead_letters(self, broadcast_id: int, user_ids):
+        """Убирает из dead letter тех, кому повторная отправка дала окончательный итог"""
+        user_ids = list(user_ids)
+        await self.flush()
+        await self._run(self._resolve_dead_letters_sync, broadcast_id, user_ids)
+
+    def _resolve_dead_letters_sync(self, broadcast_id: int, user_ids: list):
+        with self._db:
+            self._db.executemany(
+                "DELETE FROM dead_letters WHERE broadcast_id = ? AND user_id = ?",
+                [(broadcast_id, uid) for uid in user_ids]
+            )
+
+    # ─── Доставки по сообщению ────────────────────────────────
+
+    async def delivered(self, message_id: int) -> array:
+        """Кому сообщение `message_id` уже доставлено любой из рассылок (отсортировано)"""
+        await self.flush()
+        return await self._run(self._delivered_sync, message_id)
+
+    def _delivered_sync(self, message_id: int) -> array:
+        rows = self._db.execute(
+            "SELECT DISTINCT r.user_id FROM broadcasts b "
+            "JOIN recipients r ON r.broadcast_id = b.id "
+            "WHERE b.message_id = ? AND r.status = ? ORDER BY r.user_id",
+            (message_id, STATUS_OK)
+        )
+        return array("Q", (uid for (uid,) in rows))
+
+    async def enable_auto(self, broadcast_id: int, message_id: int):
+        """Новые участники будут получать сообщение рассылки при входе"""
+        await self._run(self._enable_auto_sync, broadcast_id, message_id)
+
+    def _enable_auto_sync(self, broadcast_id: int, message_id: int):
+        with self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO auto_deliveries (broadcast_id, message_id, created_at) "
+                "VALUES (?, ?, ?)",
+                (broadcast_id, message_id, time.time())
+            )
+
+    async def disable_auto(self, broadcast_id: int) -> bool:
+        return await self._run(self._disable_auto_sync, broadcast_id)
+
+    def _disable_auto_sync(self, broadcast_id: int) -> bool:
+        with self._db:
+            cursor = self._db.execute("DELETE FROM auto_deliveries WHERE broadcast_id = ?", (broadcast_id,))
+        return cursor.rowcount > 0
+
+    async def auto_deliveries(self) -> dict:
+        """{broadcast_id: message_id} для досылки новым участникам"""
+        return await self._run(self._auto_deliveries_sync)
+
+    def _auto_deliveries_sync(self) -> dict:
+        return dict(self._db.execute("SELECT broadcast_id, message_id FROM auto_deliveries"))
+
+    def close(self):
+        """Синхронно дописывает буфер и закрывает БД (вызывается после остановки бота)"""
+        self._executor.shutdown(wait=True)
+        if self._buffer or self._dead:
+            self._write_batch(self._buffer, self._dead)
+            self._buffer = []
+            self._dead = []
+        self._db.close()
@@ -0,0 +1,98 @@
+"""
+🍑 PeachMine » Рассылка — учёт доставок по сообщению
+
+Кому исходное сообщение уже доставлено. Отдельной записи на каждую
+отправку нет: журнал и так хранит статус каждого получателя, поэтому
+множество строится одним запросом по всем рассылкам этого сообщения и
+дальше пополняется в памяти из on_result. Повторная рассылка того же
+сообщения («дельта») и досылка новым участникам идут только по тем, кого
+в множестве нет, — O(новых), а не O(гильдии).
+"""
+
+import asyncio
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+# Сколько сообщений держим в памяти
+LEDGER_MESSAGES = 8
+# Свежие ID копятся в set и вливаются в отсортированный массив пачкой
+COMPACT_AT = 4096
+
+
+class DeliveredSet:
+    """Отсортированный array('Q') доставленных ID плюс небольшой set свежих"""
+
+    __slots__ = ("_ids", "_recent")
+
+    def __init__(self, ids: array = None):
+        self._ids = ids if ids is not None else array("Q")
+        self._recent = set()
+
+    def __len__(self) -> int:
+        return len(self._ids) + len(self._recent)
+
+    def __contains__(self, user_id: int) -> bool:
+        if user_id in self._recent:
+            return True
+        i = bisect_left(self._ids, user_id)
+        return i < len(self._ids) and self._ids[i] == user_id
+
+    def add(self, user_id: int):
+        if user_id in self:
+            return
+        self._recent.add(user_id)
+        if len(self._recent) >= COMPACT_AT:
+            self.merge(())
+
+    def merge(self, ids):
+        """Вливает отсортированные или нет ID (и накопленные свежие) в массив"""
+        merged = set(self._ids)
+        merged.update(self._recent)
+        merged.update(ids)
+        self._ids = array("Q", sorted(merged))
+        self._recent.clear()
+
+    def missing(self, user_ids) -> array:
+        """ID из `user_ids`, которым сообщение ещё не доставлено (порядок сохраняется)"""
+        if not self:
+            return user_ids if isinstance(user_ids, array) else array("Q", user_ids)
+        return array("Q", (uid for uid in user_ids if uid not in self))
+
+
+class DeliveryLedger:
+    """Множества доставленных по ID сообщения: LRU поверх журнала"""
+
+    def __init__(self, journal, max_messages: int = LEDGER_MESSAGES):
+        self.journal = journal
+        self.max_messages = max_messages
+        self._sets = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    async def get(self, message_id: int) -> DeliveredSet:
+        delivered = self._sets.get(message_id)
+        if delivered is not None:
+            self._sets.move_to_end(message_id)
+            return delivered
+        async with self._lock:
+            if message_id in self._sets:
+                return self._sets[message_id]
+            # Регистрируем до запроса: доставки во время загрузки не потеряются
+            delivered = self._register(message_id)
+            delivered.merge(await self.journal.delivered(message_id))
+            return delivered
+
+    def _register(self, message_id: int) -> DeliveredSet:
+        delivered = self._sets[message_id] = DeliveredSet()
+        while len(self._sets) > self.max_messages:
+            self._sets.popitem(last=False)
+        return delivered
+
+    def add(self, message_id: int, user_id: int):
+        """Успешная доставка; если сообщения нет в памяти — оно подгрузится из журнала"""
+        delivered = self._sets.get(message_id)
+        if delivered is not None:
+            delivered.add(user_id)
+
+    async def missing(self, message_id: int, user_ids) -> array:
+        return (await self.get(message_id)).missing(user_ids)
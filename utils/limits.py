@@ -0,0 +1,91 @@
+"""
+🍑 PeachMine » Рассылка — лимиты сообщений Discord
+
+Сообщение рассылки одно на всех, поэтому и проверять его нужно один раз:
+если оно не влезает в лимиты Discord, каждая из тысяч отправок вернёт
+одну и ту же 400. validate() смотрит на итоговое тело (уже с инвайтом)
+до подтверждения, а split_text() режет длинный текст на части, которые
+ложатся в несколько embed'ов одного сообщения.
+"""
+
+CONTENT_LIMIT = 2000
+EMBEDS_PER_MESSAGE = 10
+FILES_PER_MESSAGE = 10
+# Сумма title, description, полей, footer и author по всем embed'ам сообщения
+EMBED_TOTAL_LIMIT = 6000
+EMBED_TITLE_LIMIT = 256
+EMBED_DESCRIPTION_LIMIT = 4096
+EMBED_FIELDS_LIMIT = 25
+FIELD_NAME_LIMIT = 256
+FIELD_VALUE_LIMIT = 1024
+FOOTER_LIMIT = 2048
+AUTHOR_LIMIT = 256
+
+
+def embed_length(embed: dict) -> int:
+    """Сколько символов embed занимает в общем лимите EMBED_TOTAL_LIMIT"""
+    length = len(embed.get("title") or "") + len(embed.get("description") or "")
+    length += len((embed.get("footer") or {}).get("text") or "")
+    length += len((embed.get("author") or {}).get("name") or "")
+    for field in embed.get("fields") or ():
+        length += len(field.get("name") or "") + len(field.get("value") or "")
+    return length
+
+
+def _over(what: str, size: int, limit: int) -> str:
+    return f"{what}: {size} из {limit} (на {size - limit} больше)"
+
+
+def validate(data: dict, files=(), *, max_file_size: int = None) -> list:
+    """Что в итоговом сообщении превышает лимиты Discord; пустой список — можно отправлять"""
+    problems = []
+    content = data.get("content") or ""
+    if len(content) > CONTENT_LIMIT:
+        problems.append(_over("Текст сообщения", len(content), CONTENT_LIMIT))
+
+    embeds = data.get("embeds") or []
+    if len(embeds) > EMBEDS_PER_MESSAGE:
+        problems.append(_over("Embed'ов", len(embeds), EMBEDS_PER_MESSAGE))
+    for number, embed in enumerate(embeds, 1):
+        name = f"Embed {number}"
+        checks = [
+            ("заголовок", len(embed.get("title") or ""), EMBED_TITLE_LIMIT),
+            ("описание", len(embed.get("description") or ""), EMBED_DESCRIPTION_LIMIT),
+            ("полей", len(embed.get("fields") or ()), EMBED_FIELDS_LIMIT),
+            ("footer", len((embed.get("footer") or {}).get("text") or ""), FOOTER_LIMIT),
+            ("автор", len((embed.get("author") or {}).get("name") or ""), AUTHOR_LIMIT),
+        ]
+        for field in embed.get("fields") or ():
+            checks.append(("имя поля", len(field.get("name") or ""), FIELD_NAME_LIMIT))
+            checks.append(("значение поля", len(field.get("value") or ""), FIELD_VALUE_LIMIT))
+        problems.extend(_over(f"{name}, {what}", size, limit) for what, size, limit in checks if size > limit)
+    total = sum(map(embed_length, embeds))
+    if total > EMBED_TOTAL_LIMIT:
+        problems.append(_over("Символов во всех embed'ах", total, EMBED_TOTAL_LIMIT))
+
+    files = list(files)
+    if len(files) > FILES_PER_MESSAGE:
+        problems.append(_over("Вложений", len(files), FILES_PER_MESSAGE))
+    if max_file_size is not None:
+        problems.extend(
+            _over(f"Вложение {name}, байт", len(blob), max_file_size)
+            for name, blob in files if len(blob) > max_file_size
+        )
+    return problems
+
+
+def split_text(text: str, limit: int) -> list:
+    """Режет текст на части не длиннее `limit`: по абзацам, строкам, пробелам — и только потом посреди слова"""
+    parts = []
+    while len(text) > limit:
+        cut = text.rfind("\n\n", 0, limit + 1)
+        if cut < limit // 2:
+            cut = text.rfind("\n", 0, limit + 1)
+        if cut < limit // 2:
+            cut = text.rfind(" ", 0, limit + 1)
+        if cut <= 0:
+            cut = limit
+        parts.append(text[:cut].rstrip())
+        text = text[cut:].lstrip()
+    parts.append(text)
+    return parts
@@ -0,0 +1,142 @@
+"""
+🍑 PeachMine » Рассылка — структурированные логи
+
+События пишутся JSON-строками отдельным потоком: цикл событий только
+кладёт словарь в очередь и не ждёт stdout. Для рассылки вместо строки на
+каждого получателя — BroadcastLog: сводка раз в `interval` секунд и
+ограниченная выборка ошибок, так что объём логов не растёт с размером
+рассылки.
+"""
+
+import json
+import queue
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+# Сколько ошибок по отдельности показываем за один интервал сводки
+ERROR_SAMPLES_PER_INTERVAL = 5
+
+_STOP = object()
+
+
+class JsonLogger:
+    """Очередь событий и фоновый поток, который пишет их в `stream`"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def log(self, event: str, level: str = "info", **fields):
+        """Ставит событие в очередь; не блокирует вызывающего"""
+        fields["ts"] = time.time()
+        fields["level"] = level
+        fields["event"] = event
+        self._queue.put(fields)
+        if self._thread is None:
+            self._start()
+
+    def info(self, event: str, **fields):
+        self.log(event, "info", **fields)
+
+    def warning(self, event: str, **fields):
+        self.log(event, "warning", **fields)
+
+    def error(self, event: str, **fields):
+        self.log(event, "error", **fields)
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="json-log", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            lines = []
+            # Забираем всё, что накопилось, и пишем одним вызовом
+            while item is not _STOP:
+                lines.append(self._format(item))
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if lines:
+                try:
+                    self.stream.write("".join(lines))
+                    self.stream.flush()
+                except (OSError, ValueError):
+                    pass
+            if item is _STOP:
+                return
+
+    @staticmethod
+    def _format(fields: dict) -> str:
+        ts = datetime.fromtimestamp(fields.pop("ts"), timezone.utc)
+        record = {"ts": ts.isoformat(timespec="milliseconds"), "level": fields.pop("level"),
+                  "event": fields.pop("event"), **fields}
+        return json.dumps(record, ensure_ascii=False, default=str) + "\n"
+
+    def close(self, timeout: float = 5.0):
+        """Дописывает очередь и останавливает поток"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+
+class BroadcastLog:
+    """
+    Агрегированный лог одной рассылки.
+
+    `record()` только увеличивает счётчики; раз в `interval` секунд
+    уходит одна строка broadcast.progress с приростом по итогам, а из
+    ошибок в лог попадают первые ERROR_SAMPLES_PER_INTERVAL за интервал.
+    """
+
+    def __init__(self, logger: JsonLogger, broadcast_id, interval: float = 1.0):
+        self.logger = logger
+        self.broadcast_id = broadcast_id
+        self.interval = interval
+        self.totals = Counter()
+        self._window = Counter()
+        self._errors = Counter()
+        self._samples = 0
+        self._last = time.monotonic()
+
+    def record(self, outcome: str, user_id: int, detail=None):
+        self.totals[outcome] += 1
+        self._window[outcome] += 1
+        if detail is not None and outcome != "ok":
+            self._errors[str(detail)] += 1
+            if self._samples < ERROR_SAMPLES_PER_INTERVAL:
+                self._samples += 1
+                self.logger.warning("broadcast.send_failed", broadcast=self.broadcast_id,
+                                    user_id=user_id, outcome=outcome, detail=str(detail))
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._emit(now)
+
+    def _emit(self, now: float):
+        self.logger.info("broadcast.progress", broadcast=self.broadcast_id,
+                         window=round(now - self._last, 3), sent=dict(self._window),
+                         processed=sum(self.totals.values()))
+        self._window.clear()
+        self._samples = 0
+        self._last = now
+
+    def close(self, **fields):
+        """Последняя сводка и итог с самыми частыми причинами ошибок"""
+        if self._window:
+            self._emit(time.monotonic())
+        self.logger.info("broadcast.finished", broadcast=self.broadcast_id, totals=dict(self.totals),
+                         top_errors=dict(self._errors.most_common(5)), **fields)
+
+
+logger = JsonLogger()
@@ -0,0 +1,227 @@
+"""
+🍑 PeachMine » Рассылка — индекс участников
+
+Отсортированные массивы 64-битных ID участников-людей по гильдиям и по
+ролям. Строится один раз при запуске и поддерживается событиями входа,
+выхода и смены ролей, поэтому подсчёт — O(1), снимок для рассылки не
+копирует данные, а аудитория по ролям — операции над множествами в C,
+без прохода по Member.roles.
+"""
+
+from array import array
+from bisect import bisect_left
+
+
+class IdArray:
+    """Отсортированный массив ID с копированием при записи"""
+
+    __slots__ = ("_ids", "_shared")
+
+    def __init__(self, ids=()):
+        self._ids = array("Q", sorted(set(ids)))
+        self._shared = False
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, user_id: int) -> bool:
+        i = bisect_left(self._ids, user_id)
+        return i < len(self._ids) and self._ids[i] == user_id
+
+    def _writable(self) -> array:
+        # Снимок уже отдан рассылке — меняем копию, а не его
+        if self._shared:
+            self._ids = array("Q", self._ids)
+            self._shared = False
+        return self._ids
+
+    def add(self, user_id: int) -> bool:
+        i = bisect_left(self._ids, user_id)
+        if i < len(self._ids) and self._ids[i] == user_id:
+            return False
+        self._writable().insert(i, user_id)
+        return True
+
+    def discard(self, user_id: int) -> bool:
+        i = bisect_left(self._ids, user_id)
+        if i >= len(self._ids) or self._ids[i] != user_id:
+            return False
+        del self._writable()[i]
+        return True
+
+    def snapshot(self) -> array:
+        """Текущий массив без копирования (только для чтения!)"""
+        self._shared = True
+        return self._ids
+
+
+class Segment:
+    """
+    Аудитория по ролям: `include` — хотя бы одна из ролей (или все, если
+    `match_all`), `exclude` — ни одной из ролей. Пустой include — все.
+    """
+
+    __slots__ = ("include", "exclude", "match_all")
+
+    def __init__(self, include=(), exclude=(), match_all: bool = False):
+        self.include = tuple(include)
+        self.exclude = tuple(exclude)
+        self.match_all = match_all
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    def excludes(self, role_ids) -> bool:
+        """Есть ли у участника хотя бы одна из исключающих ролей"""
+        return bool(self.exclude) and not set(role_ids).isdisjoint(self.exclude)
+
+    def matches(self, role_ids) -> bool:
+        """Проверка одного участника (для потоковой рассылки без индекса)"""
+        role_ids = set(role_ids)
+        if self.excludes(role_ids):
+            return False
+        if not self.include:
+            return True
+        if self.match_all:
+            return role_ids.issuperset(self.include)
+        return not role_ids.isdisjoint(self.include)
+
+    def to_dict(self) -> dict:
+        return {"include": list(self.include), "exclude": list(self.exclude), "match_all": self.match_all}
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        if not data:
+            return cls()
+        return cls(data.get("include", ()), data.get("exclude", ()), data.get("match_all", False))
+
+
+def _role_ids(member) -> list:
+    # @everyone (ID роли = ID гильдии) есть у всех — в индексе ролей он не нужен
+    return [role.id for role in member.roles if role.id != member.guild.id]
+
+
+class MemberIndex:
+    """ID участников-людей (без ботов) по гильдиям и по ролям"""
+
+    def __init__(self):
+        self._guilds = {}
+        self._roles = {}
+
+    def rebuild(self, guild):
+        """Полная пересборка по кэшу гильдии (при запуске)"""
+        humans = []
+        by_role = {}
+        for member in guild.members:
+            if member.bot:
+                continue
+            humans.append(member.id)
+            for role_id in _role_ids(member):
+                by_role.setdefault(role_id, []).append(member.id)
+        self._guilds[guild.id] = IdArray(humans)
+        self._roles[guild.id] = {role_id: IdArray(ids) for role_id, ids in by_role.items()}
+
+    def add(self, member):
+        if member.bot:
+            return
+        self._guilds.setdefault(member.guild.id, IdArray()).add(member.id)
+        roles = self._roles.setdefault(member.guild.id, {})
+        for role_id in _role_ids(member):
+            roles.setdefault(role_id, IdArray()).add(member.id)
+
+    def remove(self, member):
+        ids = self._guilds.get(member.guild.id)
+        if ids is not None:
+            ids.discard(member.id)
+        roles = self._roles.get(member.guild.id, {})
+        for role_id in _role_ids(member):
+            if role_id in roles:
+                roles[role_id].discard(member.id)
+
+    def update_roles(self, before, after):
+        """Смена ролей участника (on_member_update)"""
+        if after.bot:
+            return
+        old, new = set(_role_ids(before)), set(_role_ids(after))
+        if old == new:
+            return
+        roles = self._roles.setdefault(after.guild.id, {})
+        for role_id in new - old:
+            roles.setdefault(role_id, IdArray()).add(after.id)
+        for role_id in old - new:
+            if role_id in roles:
+                roles[role_id].discard(after.id)
+
+    def drop_role(self, guild_id: int, role_id: int):
+        """Роль удалена с сервера"""
+        self._roles.get(guild_id, {}).pop(role_id, None)
+
+    def with_roles(self, guild_ids, role_ids) -> set:
+        """ID участников, у которых хотя бы на одном из серверов есть одна из ролей"""
+        result = set()
+        for guild_id in guild_ids:
+            roles = self._roles.get(guild_id, {})
+            for role_id in role_ids:
+                ids = roles.get(role_id)
+                if ids is not None:
+                    result.update(ids.snapshot())
+        return result
+
+    def merged_audience(self, guild_ids, segment: Segment = None) -> tuple:
+        """
+        Аудитория сразу нескольких гильдий без повторов: (отсортированные
+        ID, сколько повторов убрано). Человек с трёх серверов — один ID.
+        Исключающая роль на любом из серверов исключает человека со всех.
+        """
+        guild_ids = list(guild_ids)
+        segment = segment or Segment()
+        if len(guild_ids) == 1:
+            return self.audience(guild_ids[0], segment), 0
+        # Включение — по каждому серверу, исключение — после объединения
+        included = Segment(segment.include, match_all=segment.match_all)
+        arrays = [self.audience(guild_id, included) for guild_id in guild_ids]
+        excluded = self.with_roles(guild_ids, segment.exclude)
+        merged = set().union(*arrays)
+        merged.difference_update(excluded)
+        kept = sum(len(ids) for ids in arrays)
+        if excluded:
+            kept -= sum(uid in excluded for ids in arrays for uid in ids)
+        return array("Q", sorted(merged)), kept - len(merged)
+
+    def audience(self, guild_id: int, segment: Segment) -> array:
+        """Отсортированные ID участников сегмента"""
+        if not segment:
+            return self.snapshot(guild_id)
+        roles = self._roles.get(guild_id, {})
+        empty = array("Q")
+
+        def members_of(role_id):
+            ids = roles.get(role_id)
+            return ids.snapshot() if ids is not None else empty
+
+        if segment.include:
+            arrays = sorted((members_of(r) for r in segment.include), key=len)
+            if segment.match_all:
+                # Начинаем с самой маленькой роли — пересечение не больше неё
+                result = set(arrays[0])
+                for ids in arrays[1:]:
+                    result.intersection_update(ids)
+            else:
+                result = set().union(*arrays)
+        else:
+            result = set(self.snapshot(guild_id))
+        for role_id in segment.exclude:
+            result.difference_update(members_of(role_id))
+        everyone = self.snapshot(guild_id)
+        if len(result) * 4 < len(everyone):
+            return array("Q", sorted(result))
+        # Большой сегмент: порядок берём из общего отсортированного массива — без sort()
+        return array("Q", filter(result.__contains__, everyone))
+
+    def count(self, guild_id: int) -> int:
+        ids = self._guilds.get(guild_id)
+        return len(ids) if ids is not None else 0
+
+    def snapshot(self, guild_id: int) -> array:
+        ids = self._guilds.get(guild_id)
+        return ids.snapshot() if ids is not None else array("Q")
@@ -0,0 +1,177 @@
+"""
+🍑 PeachMine » Рассылка — метрики в формате Prometheus
+
+Минимальные счётчики, gauge'и и гистограммы без внешних зависимостей и
+встроенный HTTP-эндпоинт /metrics на aiohttp. Обновление метрики — это
+пара операций со словарём, так что их можно дёргать на горячем пути.
+"""
+
+import time
+from bisect import bisect_left
+from collections import deque
+
+from aiohttp import web
+
+# Границы гистограммы задержки отправки, сек
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{n}="{v}"' for n, v in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> list:
+        lines = self.header()
+        for values, value in self._values.items():
+            lines.append(f"{self.name}{_labels(self.label_names, values)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(Metric):
+    """Gauge; с `func` значение считается в момент запроса /metrics"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), func=None):
+        super().__init__(name, documentation, labels)
+        self.func = func
+
+    def set(self, value: float, *labels):
+        self._values[labels] = value
+
+    def inc(self, *labels, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def render(self) -> list:
+        if self.func is not None:
+            try:
+                value = self.func()
+            except Exception:
+                value = float("nan")
+            return self.header() + [f"{self.name} {value}"]
+        return super().render()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value: float):
+        self._counts[bisect_left(self.buckets, value)] += 1
+        self._sum += value
+        self._count += 1
+
+    def render(self) -> list:
+        lines = self.header()
+        cumulative = 0
+        for bound, count in zip(self.buckets, self._counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {self._count}')
+        lines.append(f"{self.name}_sum {self._sum}")
+        lines.append(f"{self.name}_count {self._count}")
+        return lines
+
+
+class Throughput:
+    """Скорость событий за последние `window` секунд"""
+
+    def __init__(self, window: float = 10.0):
+        self.window = window
+        self._marks = deque()
+
+    def mark(self):
+        self._marks.append(time.monotonic())
+
+    def rate(self) -> float:
+        now = time.monotonic()
+        while self._marks and now - self._marks[0] > self.window:
+            self._marks.popleft()
+        return len(self._marks) / self.window
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+send_throughput = Throughput()
+
+# ─── Метрики рассылки ────────────────────────────────────────
+
+SENDS = registry.register(Counter(
+    "peachmine_sends_total", "Отправленные ЛС по итогу", ("outcome",)))
+SEND_LATENCY = registry.register(Histogram(
+    "peachmine_send_latency_seconds", "Задержка отправки одного ЛС"))
+RATE_LIMITED = registry.register(Counter(
+    "peachmine_rate_limited_total", "Ответы 429 от Discord", ("scope",)))
+RETRIES = registry.register(Counter(
+    "peachmine_retries_total", "Повторные попытки отправки"))
+QUEUE_DEPTH = registry.register(Gauge(
+    "peachmine_dispatch_queue_depth", "Получателей в очереди диспетчера"))
+SEND_RATE = registry.register(Gauge(
+    "peachmine_send_rate", "Текущая скорость отправки, сообщений/сек", func=send_throughput.rate))
+RATE_LIMIT = registry.register(Gauge(
+    "peachmine_rate_limit", "Текущий лимит token bucket, сообщений/сек"))
+
+
+def observe_send(outcome: str, seconds: float):
+    """Учитывает одну завершённую отправку"""
+    SENDS.inc(outcome)
+    SEND_LATENCY.observe(seconds)
+    send_throughput.mark()
+
+
+async def start_server(port: int, host: str = "0.0.0.0") -> web.AppRunner:
+    """Поднимает HTTP-эндпоинт /metrics"""
+    async def handle(request: web.Request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
@@ -0,0 +1,65 @@
+"""
+🍑 PeachMine » Рассылка — файлы итогов рассылок
+
+Итог рассылки в колоночном виде: сначала ID всех получателей подряд (по
+8 байт), следом по байту статуса журнала на каждого — 9 байт на
+получателя, на 100k получателей меньше мегабайта. Файл пишется целиком,
+когда рассылка (или её досылка, или повтор) заканчивается, и читается
+одним read: выбрать тех, кому помешала временная ошибка, — проход по
+bytearray, без запросов к журналу.
+"""
+
+import os
+import struct
+import sys
+from array import array
+
+from .recipients import RecipientList
+
+MAGIC = b"PMOUTC01"
+# Сигнатура и число получателей; ID дальше в little-endian
+HEADER = struct.Struct("<8sQ")
+
+
+class OutcomeStore:
+    """Файлы итогов `<ID рассылки>.outcomes` в одной папке"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, broadcast_id: int) -> str:
+        return os.path.join(self.directory, f"{broadcast_id}.outcomes")
+
+    def write(self, broadcast_id: int, ids: array, status):
+        """Записывает итог атомарно: читатель видит либо старый файл, либо новый"""
+        if len(ids) != len(status):
+            raise ValueError("ids and status differ in length")
+        if sys.byteorder == "big":
+            ids = array("Q", ids)
+            ids.byteswap()
+        path = self.path(broadcast_id)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as file:
+            file.write(HEADER.pack(MAGIC, len(ids)))
+            file.write(ids)
+            file.write(status)
+        os.replace(tmp, path)
+
+    def read(self, broadcast_id: int):
+        """RecipientList со статусами из файла или None, если файла нет (или он битый)"""
+        try:
+            with open(self.path(broadcast_id), "rb") as file:
+                data = file.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < HEADER.size:
+            return None
+        magic, count = HEADER.unpack_from(data)
+        if magic != MAGIC or len(data) != HEADER.size + count * 9:
+            return None
+        ids = array("Q")
+        ids.frombytes(data[HEADER.size:HEADER.size + count * 8])
+        if sys.byteorder == "big":
+            ids.byteswap()
+        return RecipientList(ids, data[HEADER.size + count * 8:])
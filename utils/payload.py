@@ -0,0 +1,36 @@
+"""
+🍑 PeachMine » Рассылка — скомпилированное сообщение рассылки
+
+Сообщение одинаково для всех получателей, поэтому embed'ы, текст и
+JSON-тело собираются один раз при подтверждении рассылки, а горячий цикл
+отправки переиспользует готовые байты.
+"""
+
+import json
+from types import MappingProxyType
+
+
+def dumps(data: dict) -> bytes:
+    """Компактная сериализация JSON-тела для Discord API"""
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class CompiledPayload:
+    """Неизменяемое, заранее сериализованное тело сообщения рассылки"""
+
+    __slots__ = ("data", "body", "files")
+
+    def __init__(self, data: dict, files=()):
+        # Храним только для чтения — тело уже сериализовано и должно совпадать
+        self.data = MappingProxyType(dict(data))
+        self.files = tuple(files)
+        self.body = dumps(data)
+
+    def __setattr__(self, name, value):
+        if hasattr(self, "body"):
+            raise AttributeError("CompiledPayload is immutable")
+        object.__setattr__(self, name, value)
+
+    @property
+    def upload_size(self) -> int:
+        return sum(len(data) for _, data in self.files)
@@ -0,0 +1,108 @@
+"""
+🍑 PeachMine » Рассылка — кэш подготовленных рассылок
+
+Повторный /news по тому же сообщению (поправили опечатку и запустили
+снова) не должен заново качать вложения. Кэш хранит три вида записей в
+одном LRU с общим лимитом по байтам:
+
+- файлы вложений по ID вложения — вложения в Discord неизменяемы, так что
+  ID однозначно задаёт содержимое и байты не нужно хэшировать;
+- подготовленные сообщения по хэшу нормализованного текста, embed'ов и
+  ID вложений — при совпадении превью собирается без загрузок вовсе;
+- ссылки на уже загруженные в Discord вложения (ATTACHMENT_FANOUT) по
+  набору ID вложений — следующая рассылка тех же файлов их не грузит.
+
+Запись сообщения держит те же буферы, что и записи файлов, поэтому при
+вытеснении файла вытесняются и зависящие от него сообщения.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+KIND_FILE = "file"
+KIND_MESSAGE = "message"
+KIND_UPLOAD = "upload"
+
+
+def content_key(content: str, embeds: list, attachment_ids) -> str:
+    """Хэш сообщения: текст без разницы в переводах строк и хвостовых пробелах, embed'ы и вложения"""
+    text = "\n".join(line.rstrip() for line in (content or "").replace("\r\n", "\n").split("\n")).strip()
+    raw = json.dumps([text, embeds, list(attachment_ids)], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class PayloadCache:
+    """LRU по байтам и числу записей"""
+
+    def __init__(self, max_bytes: int, max_entries: int = 256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # (вид, ключ) → (значение, размер, ID вложений, от которых запись зависит)
+        self._entries = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get(self, kind: str, key):
+        entry = self._entries.get((kind, key))
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end((kind, key))
+        self.hits += 1
+        return entry[0]
+
+    def _put(self, kind: str, key, value, size: int, depends=()):
+        if size > self.max_bytes:
+            return
+        self._drop((kind, key))
+        self._entries[(kind, key)] = (value, size, tuple(depends))
+        self.size += size
+        while self.size > self.max_bytes or len(self._entries) > self.max_entries:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, entry_key):
+        entry = self._entries.pop(entry_key, None)
+        if entry is None:
+            return
+        self.size -= entry[1]
+        kind, key = entry_key
+        if kind == KIND_FILE:
+            # Сообщение без своего файла держало бы буфер мимо лимита
+            for other in [k for k, e in self._entries.items() if key in e[2]]:
+                self._drop(other)
+
+    # ─── Файлы вложений ───────────────────────────────────────
+
+    def get_file(self, attachment_id: int):
+        return self._get(KIND_FILE, attachment_id)
+
+    def put_file(self, attachment_id: int, data):
+        self._put(KIND_FILE, attachment_id, data, len(data))
+
+    # ─── Подготовленные сообщения ─────────────────────────────
+
+    def get_message(self, key: str):
+        return self._get(KIND_MESSAGE, key)
+
+    def put_message(self, key: str, prepared, attachment_ids=()):
+        # Байты вложений уже посчитаны в записях файлов
+        if all((KIND_FILE, a) in self._entries for a in attachment_ids):
+            self._put(KIND_MESSAGE, key, prepared, len(key), attachment_ids)
+
+    # ─── Загруженные вложения ─────────────────────────────────
+
+    def get_upload(self, attachment_ids: tuple, ttl: float):
+        """(ссылки, время загрузки по time.monotonic()) — если ещё не протухли"""
+        upload = self._get(KIND_UPLOAD, attachment_ids)
+        if upload is None or time.monotonic() - upload[1] >= ttl:
+            return None
+        return upload
+
+    def put_upload(self, attachment_ids: tuple, references: list, uploaded_at: float):
+        self._put(KIND_UPLOAD, attachment_ids, (references, uploaded_at), 0)
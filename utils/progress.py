@@ -0,0 +1,144 @@
+"""
+🍑 PeachMine » Рассылка — отчёт о прогрессе рассылки
+
+Отдельная задача раз в `interval` секунд читает общие счётчики диспетчера
+и обновляет статус. Отправители её не ждут: если редактирование
+сообщения тормозит, страдает только частота обновлений.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from .log import logger
+
+
+class ProgressReporter:
+    """
+    Периодически публикует прогресс рассылки.
+
+    `stats` — общий словарь счётчиков (BroadcastDispatcher.stats),
+    `render(snapshot)` строит то, что нужно показать, а
+    `publish(rendered)` — корутина, которая это показывает.
+    `expected` — оценка числа получателей, пока потоковый источник
+    ещё не прочитан до конца.
+    """
+
+    def __init__(self, stats: dict, render, publish, interval: float = 5.0,
+                 window: float = 30.0, expected: int = 0):
+        self.stats = stats
+        self.expected = expected
+        self.render = render
+        self.publish = publish
+        self.interval = interval
+        self.window = window
+        self._started = time.monotonic()
+        self._samples = deque()
+        self._published = None
+        self._task = None
+
+    def snapshot(self) -> dict:
+        """Текущее состояние: счётчики, скорость (сообщений/сек) и ETA"""
+        now = time.monotonic()
+        total = max(self.stats["total"], self.expected)
+        processed = self.stats["success"] + self.stats["failed"]
+
+        # Скорость по скользящему окну — реагирует на замедления из-за 429
+        self._samples.append((now, processed))
+        while len(self._samples) > 2 and now - self._samples[0][0] > self.window:
+            self._samples.popleft()
+        first_time, first_processed = self._samples[0]
+        elapsed = now - first_time
+        rate = (processed - first_processed) / elapsed if elapsed > 0 else 0.0
+
+        remaining = total - processed
+        eta = remaining / rate if rate > 0 else None
+        return {
+            "processed": processed,
+            "total": total,
+            "success": self.stats["success"],
+            "failed": self.stats["failed"],
+            "rate": rate,
+            "eta": eta,
+            "elapsed": now - self._started,
+        }
+
+    def start(self):
+        self.snapshot()  # первая точка для расчёта скорости
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> dict:
+        """Останавливает отчёт и возвращает итоговый снимок"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        return self.snapshot()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            snapshot = self.snapshot()
+            # Ничего не изменилось — не тратим запрос
+            if snapshot["processed"] == self._published:
+                continue
+            self._published = snapshot["processed"]
+            try:
+                await self.publish(self.render(snapshot))
+            except Exception as e:
+                logger.warning("broadcast.progress_failed", error=str(e))
+
+
+# Токен интеракции Discord живёт 15 минут — перестаём им пользоваться с запасом
+INTERACTION_TOKEN_TTL = 14 * 60
+
+
+class StatusPublisher:
+    """
+    Публикует статус туда, где его будет видно до конца рассылки:
+    в ответ на интеракцию, пока жив её токен, и в постоянное сообщение
+    бота (канал админов или ЛС), которое можно редактировать сколько угодно.
+
+    Заранее оценить длительность нельзя (пауза, 429, общий лимит), поэтому
+    `on_expire` — корутина без аргументов, которая создаёт постоянное
+    сообщение и вызывает attach(). Она вызывается один раз, при первой
+    публикации после истечения токена, если сообщение ещё не подключено.
+    """
+
+    def __init__(self, edit_interaction, token_ttl: float = INTERACTION_TOKEN_TTL, on_expire=None):
+        self.edit_interaction = edit_interaction
+        self.edit_message = None
+        self.on_expire = on_expire
+        self._attaching = None
+        self._deadline = time.monotonic() + token_ttl
+
+    @property
+    def interaction_alive(self) -> bool:
+        return time.monotonic() < self._deadline
+
+    def attach(self, edit_message):
+        """Подключает постоянное сообщение со статусом"""
+        self.edit_message = edit_message
+
+    async def publish(self, rendered):
+        if self.edit_message is None and self.on_expire is not None and not self.interaction_alive:
+            # Одна задача на всех: параллельная публикация дождётся того же сообщения
+            if self._attaching is None:
+                self._attaching = asyncio.ensure_future(self.on_expire())
+            try:
+                await asyncio.shield(self._attaching)
+            except Exception as e:
+                logger.warning("broadcast.status_attach_failed", error=str(e))
+            self.on_expire = None
+        targets = [self.edit_message] if self.edit_message is not None else []
+        if self.interaction_alive:
+            targets.append(self.edit_interaction)
+
+        errors = []
+        for target in targets:
+            try:
+                await target(rendered)
+            except Exception as e:
+                errors.append(e)
+        # Ошибка важна, только если статус не удалось показать нигде
+        if targets and len(errors) == len(targets):
+            raise errors[0]
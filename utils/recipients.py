@@ -0,0 +1,64 @@
+"""
+🍑 PeachMine » Рассылка — источники получателей
+"""
+
+from array import array
+
+from .journal import OUTCOME_STATUS, STATUS_PENDING
+
+
+class RecipientList:
+    """
+    Компактный список получателей: ID пользователей в array('Q') и
+    параллельный bytearray статусов (статусы журнала) — 9 байт на
+    человека. Объекты участников не держим: ЛС открывается по ID в момент
+    отправки, так что ни окно подтверждения, ни идущая рассылка не
+    удерживают в памяти тех, кто уже вышел с сервера.
+    """
+
+    __slots__ = ("ids", "status")
+
+    def __init__(self, ids=(), status=None):
+        self.ids = ids if isinstance(ids, array) and ids.typecode == "Q" else array("Q", ids)
+        self.status = bytearray(status) if status is not None else bytearray(len(self.ids))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def mark(self, index: int, outcome: str):
+        self.status[index] = OUTCOME_STATUS[outcome]
+
+    def pending(self) -> int:
+        """Сколько получателей ещё без итога"""
+        return self.status.count(STATUS_PENDING)
+
+    def select(self, *statuses) -> array:
+        """ID получателей с одним из статусов журнала"""
+        wanted = set(statuses)
+        return array("Q", (uid for uid, status in zip(self.ids, self.status) if status in wanted))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.ids) * self.ids.itemsize + len(self.status)
+
+
+class StreamedRecipients:
+    """
+    Получатели, которые подгружаются страницами прямо во время рассылки,
+    без кэша участников. `factory()` должна возвращать асинхронный
+    итератор ID пользователей, поэтому источник можно обойти повторно.
+    """
+
+    def __init__(self, factory, expected: int):
+        self.factory = factory
+        self.expected = expected
+
+    def __len__(self) -> int:
+        # Точное число станет известно только после обхода — отдаём оценку
+        return self.expected
+
+    def __aiter__(self):
+        return self.factory().__aiter__()
@@ -0,0 +1,52 @@
+"""
+🍑 PeachMine » Рассылка — классификация ошибок и повторы
+
+Не всякая ошибка отправки окончательная. 429 — лимит, получателя ждёт
+пауза bucket'а. 5xx, таймауты и обрывы соединения — временные: их
+повторяем с экспоненциальной задержкой и полным jitter, чтобы после сбоя
+Discord повторы не пришли одной волной. Остальные 4xx (нет такого
+пользователя, плохое тело запроса) повторять бессмысленно.
+"""
+
+import asyncio
+import random
+
+import aiohttp
+
+# Классы ошибок
+RETRY_PERMANENT = "permanent"
+RETRY_TRANSIENT = "transient"
+RETRY_RATE_LIMITED = "rate_limited"
+
+# Сколько раз повторяем получателя после временной ошибки
+MAX_TRANSIENT_RETRIES = 4
+# Задержка перед повтором: случайная в [0, min(cap, base * 2^attempt)] секунд
+BACKOFF_BASE = 1.0
+BACKOFF_CAP = 60.0
+
+# Коды, которые Discord отдаёт при перегрузке или таймауте на своей стороне
+TRANSIENT_STATUSES = {408, 500, 502, 503, 504, 520, 521, 522, 524}
+
+TRANSIENT_EXCEPTIONS = (asyncio.TimeoutError, ConnectionError, aiohttp.ClientConnectionError,
+                        aiohttp.ClientPayloadError)
+
+
+def classify_response(response) -> str:
+    """Класс неуспешного ответа"""
+    if response.status == 429:
+        return RETRY_RATE_LIMITED
+    if response.status in TRANSIENT_STATUSES:
+        return RETRY_TRANSIENT
+    return RETRY_PERMANENT
+
+
+def classify_exception(error: BaseException) -> str:
+    """Сетевые сбои и таймауты — временные; остальное (ошибка в коде) — окончательное"""
+    if isinstance(error, TRANSIENT_EXCEPTIONS):
+        return RETRY_TRANSIENT
+    return RETRY_PERMANENT
+
+
+def backoff(attempt: int, base: float = BACKOFF_BASE, cap: float = BACKOFF_CAP) -> float:
+    """Экспоненциальная задержка с полным jitter (attempt с нуля)"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
@@ -0,0 +1,265 @@
+"""
+🍑 PeachMine » Рассылка — общий планировщик рассылок
+
+Все рассылки процесса идут через один token bucket: две одновременно
+подтверждённые рассылки делят лимит бота, а не удваивают его. Токены
+раздаются по классам приоритета взвешенным round-robin — срочная
+рассылка получает большую часть скорости, но обычная не простаивает
+совсем. Запущенные рассылки можно поставить на паузу, продолжить или
+отменить по ID; запланированные ждут своего времени, а рассылка с окном
+доставки идёт равномерно, не быстрее «получатели / окно».
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from .dispatcher import BroadcastDispatcher, TokenBucket
+from .log import logger
+
+PRIORITY_URGENT = "urgent"
+PRIORITY_NORMAL = "normal"
+
+# Сколько токенов подряд получает класс за один круг round-robin
+PRIORITY_WEIGHTS = {PRIORITY_URGENT: 4, PRIORITY_NORMAL: 1}
+
+JOB_SCHEDULED = "scheduled"
+JOB_RUNNING = "running"
+JOB_PAUSED = "paused"
+JOB_CANCELLED = "cancelled"
+JOB_DONE = "done"
+
+
+class SharedBudget:
+    """Общий TokenBucket, токены которого раздаются ожидающим по приоритетам"""
+
+    def __init__(self, rate: float, weights: dict = None):
+        self.weights = weights or PRIORITY_WEIGHTS
+        self.bucket = TokenBucket(rate)
+        self._waiters = {priority: deque() for priority in self.weights}
+        self._cycle = [priority for priority, weight in self.weights.items() for _ in range(weight)]
+        self._position = 0
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def lane(self, priority: str) -> "BudgetLane":
+        if priority not in self._waiters:
+            raise ValueError(f"Неизвестный приоритет: {priority}")
+        return BudgetLane(self, priority)
+
+    async def acquire(self, priority: str):
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].append(future)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._grant_loop())
+        self._wakeup.set()
+        await future
+
+    def _next_waiter(self):
+        for _ in range(len(self._cycle)):
+            queue = self._waiters[self._cycle[self._position]]
+            self._position = (self._position + 1) % len(self._cycle)
+            # Отменённые ожидания (воркер остановлен) просто выбрасываем
+            while queue and queue[0].done():
+                queue.popleft()
+            if queue:
+                return queue.popleft()
+        return None
+
+    async def _grant_loop(self):
+        while True:
+            if not any(self._waiters.values()):
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self.bucket.acquire()
+            waiter = self._next_waiter()
+            if waiter is not None:
+                waiter.set_result(None)
+
+
+class BudgetLane:
+    """Интерфейс TokenBucket для диспетчера: acquire с приоритетом рассылки"""
+
+    def __init__(self, budget: SharedBudget, priority: str):
+        self.budget = budget
+        self.priority = priority
+
+    @property
+    def rate(self) -> float:
+        return self.budget.bucket.rate
+
+    async def acquire(self):
+        await self.budget.acquire(self.priority)
+
+    def on_rate_limited(self, retry_after: float):
+        # 429 касается токена бота целиком — замедляются все рассылки
+        self.budget.bucket.on_rate_limited(retry_after)
+
+    def on_success(self, remaining: int = None, reset_after: float = None):
+        self.budget.bucket.on_success(remaining, reset_after)
+
+
+class PacedLane:
+    """Lane с собственным темпом: не быстрее `pace` сообщений/сек, даже если общий лимит свободен"""
+
+    def __init__(self, lane: BudgetLane, pace: float):
+        self.lane = lane
+        # Ёмкость 1 — без всплесков, токены идут ровно раз в 1/pace секунд
+        self.pacer = TokenBucket(pace, capacity=1)
+
+    @property
+    def rate(self) -> float:
+        return min(self.pacer.rate, self.lane.rate)
+
+    async def acquire(self):
+        await self.pacer.acquire()
+        await self.lane.acquire()
+
+    def on_rate_limited(self, retry_after: float):
+        self.lane.on_rate_limited(retry_after)
+
+    def on_success(self, remaining: int = None, reset_after: float = None):
+        self.lane.on_success(remaining, reset_after)
+
+
+class ScheduledJob:
+    """Рассылка, которая ждёт своего времени старта"""
+
+    def __init__(self, job_id: int, start_at: float, priority: str, title: str = "",
+                 owner_id: int = None, window: float = None):
+        self.id = job_id
+        self.start_at = start_at
+        self.priority = priority
+        self.title = title
+        self.owner_id = owner_id
+        self.window = window
+        self.task = None
+        self.state = JOB_SCHEDULED
+
+
+class BroadcastJob:
+    """Одна рассылка в планировщике"""
+
+    def __init__(self, job_id: int, dispatcher: BroadcastDispatcher, priority: str,
+                 title: str = "", owner_id: int = None):
+        self.id = job_id
+        self.dispatcher = dispatcher
+        self.priority = priority
+        self.title = title
+        self.owner_id = owner_id
+        self.created_at = time.time()
+        self.finished = False
+        # Корутина без аргументов: показать новое состояние (пауза/отмена) сразу
+        self.notify = None
+
+    @property
+    def stats(self) -> dict:
+        return self.dispatcher.stats
+
+    @property
+    def state(self) -> str:
+        if self.dispatcher.cancelled:
+            return JOB_CANCELLED
+        if self.finished:
+            return JOB_DONE
+        return JOB_PAUSED if self.dispatcher.paused else JOB_RUNNING
+
+
+class BroadcastScheduler:
+    """Единая точка запуска рассылок с общим лимитом скорости"""
+
+    def __init__(self, rate: float, concurrency: int = 4):
+        self.budget = SharedBudget(rate)
+        self.concurrency = concurrency
+        self.jobs = {}
+        self.pending = {}
+
+    def create(self, job_id: int, send, *, priority: str = PRIORITY_NORMAL, on_result=None,
+               title: str = "", owner_id: int = None, pace: float = None) -> BroadcastJob:
+        """`pace` — темп рассылки с окном доставки, сообщений/сек"""
+        bucket = self.budget.lane(priority)
+        if pace:
+            bucket = PacedLane(bucket, pace)
+        dispatcher = BroadcastDispatcher(
+            send,
+            concurrency=self.concurrency,
+            on_result=on_result,
+            bucket=bucket
+        )
+        job = BroadcastJob(job_id, dispatcher, priority, title, owner_id)
+        self.jobs[job_id] = job
+        return job
+
+    async def run(self, job: BroadcastJob, recipients) -> dict:
+        try:
+            return await job.dispatcher.run(recipients)
+        finally:
+            job.finished = True
+            self.jobs.pop(job.id, None)
+
+    def schedule(self, job_id: int, start_at: float, run, *, priority: str = PRIORITY_NORMAL,
+                 title: str = "", owner_id: int = None, window: float = None) -> ScheduledJob:
+        """Запускает корутину `run()` в момент `start_at` (unix-время)"""
+        entry = ScheduledJob(job_id, start_at, priority, title, owner_id, window)
+        entry.task = asyncio.create_task(self._wait_and_run(entry, run))
+        self.pending[job_id] = entry
+        return entry
+
+    async def _wait_and_run(self, entry: ScheduledJob, run):
+        delay = entry.start_at - time.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        self.pending.pop(entry.id, None)
+        try:
+            await run()
+        except Exception as e:
+            logger.error("broadcast.scheduled_failed", broadcast=entry.id, error=repr(e))
+
+    def scheduled(self) -> list:
+        return sorted(self.pending.values(), key=lambda entry: entry.start_at)
+
+    def cancel_scheduled(self, job_id: int) -> bool:
+        entry = self.pending.pop(job_id, None)
+        if entry is None:
+            return False
+        entry.task.cancel()
+        return True
+
+    def projected_rate(self, priority: str = PRIORITY_NORMAL) -> float:
+        """
+        Скорость, которая достанется новой рассылке с приоритетом `priority`
+        при уже идущих: доля общего лимита по весам классов, которые сейчас
+        ждут токенов.
+        """
+        weights = self.budget.weights
+        active = {job.priority for job in self.jobs.values() if job.state == JOB_RUNNING}
+        active.add(priority)
+        return self.budget.bucket.rate * weights[priority] / sum(weights[p] for p in active)
+
+    def get(self, job_id: int):
+        return self.jobs.get(job_id)
+
+    def active(self) -> list:
+        return sorted(self.jobs.values(), key=lambda job: job.created_at)
+
+    def pause(self, job_id: int) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.state != JOB_RUNNING:
+            return False
+        job.dispatcher.pause()
+        return True
+
+    def resume(self, job_id: int) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.state != JOB_PAUSED:
+            return False
+        job.dispatcher.resume()
+        return True
+
+    def cancel(self, job_id: int) -> bool:
+        job = self.jobs.get(job_id)
+        if job is None or job.state == JOB_CANCELLED:
+            return False
+        job.dispatcher.cancel()
+        return True
@@ -0,0 +1,104 @@
+"""
+🍑 PeachMine » Рассылка — пробный прогон
+
+Рассылка проходит через те же BroadcastDispatcher и AttachmentFanout, но
+без сети: SimulatedTransport сразу отвечает 200 и считает запросы и
+байты, а VirtualBucket вместо сна двигает виртуальные часы. Получаем,
+сколько ЛС уйдёт, сколько байт будет отправлено и сколько это займёт при
+текущем лимите — за доли секунды даже на десятках тысяч получателей.
+"""
+
+import itertools
+
+from .dispatcher import BroadcastDispatcher
+from .fanout import AttachmentFanout, FANOUT_OFF
+from .payload import CompiledPayload, dumps
+from .recipients import RecipientList
+from .transport import RestResponse
+
+
+class VirtualBucket:
+    """TokenBucket на виртуальных часах: acquire() не ждёт, а сдвигает `now`"""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self.now = 0.0
+
+    async def acquire(self):
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return
+        # Ждали бы, пока накопится недостающая часть токена
+        self.now += (1 - self._tokens) / self.rate
+        self._tokens = 0.0
+
+    def on_rate_limited(self, retry_after: float):
+        pass
+
+    def on_success(self, remaining: int = None, reset_after: float = None):
+        pass
+
+
+class SimulatedTransport:
+    """Транспорт с интерфейсом DiscordTransport, который ничего не отправляет"""
+
+    def __init__(self, dm_channels=None):
+        # Кэш ЛС только читаем: фейковые ID каналов в него не попадают
+        self.dm_channels = dm_channels
+        self.requests = 0
+        self.dm_opened = 0
+        self.sent_bytes = 0
+        self._ids = itertools.count(1)
+
+    async def send_message(self, channel_id: int, payload, files: list = None) -> RestResponse:
+        self.requests += 1
+        self.sent_bytes += len(payload if isinstance(payload, bytes) else dumps(payload))
+        self.sent_bytes += sum(len(data) for _, data in files or ())
+        attachments = [
+            {"filename": name, "url": f"https://cdn.invalid/{name}", "content_type": "", "size": len(data)}
+            for name, data in files or ()
+        ]
+        return RestResponse(200, {"id": str(next(self._ids)), "attachments": attachments}, {})
+
+    async def send_dm(self, user_id: int, payload, files: list = None) -> RestResponse:
+        if self.dm_channels is None or user_id not in self.dm_channels:
+            # ЛС ещё не открыто — настоящая рассылка сделает лишний запрос
+            self.requests += 1
+            self.dm_opened += 1
+        return await self.send_message(0, payload, files)
+
+
+async def simulate(recipients, payload: CompiledPayload, *, rate: float, concurrency: int = 4,
+                   pace: float = None, fanout_mode: str = FANOUT_OFF, staging_channel_id: int = None,
+                   dm_channels=None) -> dict:
+    """
+    Прогоняет рассылку вхолостую. `rate` — доля общего лимита, которая
+    достанется рассылке, `pace` — темп окна доставки (если задано).
+    Время — без учёта 429 и сетевой задержки, то есть нижняя оценка.
+    """
+    transport = SimulatedTransport(dm_channels)
+    fanout = AttachmentFanout(transport, fanout_mode, staging_channel_id)
+    effective = min(rate, pace) if pace else rate
+    # С окном доставки bucket без всплесков, как PacedLane
+    bucket = VirtualBucket(effective, capacity=1 if pace else None)
+
+    async def send(user_id):
+        return await fanout.send_dm(user_id, payload)
+
+    if isinstance(recipients, RecipientList):
+        # Те же ID, но свои статусы — настоящая рассылка начнётся с чистого листа
+        recipients = RecipientList(recipients.ids)
+    dispatcher = BroadcastDispatcher(send, concurrency=concurrency, bucket=bucket, track_metrics=False)
+    stats = await dispatcher.run(recipients)
+    return {
+        "sends": stats["total"],
+        "seconds": bucket.now,
+        "rate": effective,
+        "requests": transport.requests,
+        "dm_opened": transport.dm_opened,
+        "payload_bytes": len(payload.body) + payload.upload_size,
+        "sent_bytes": transport.sent_bytes,
+        "upload_bytes": fanout.uploaded_bytes,
+    }
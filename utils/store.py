@@ -0,0 +1,99 @@
+"""
+🍑 PeachMine » Рассылка — словарь с пакетным сохранением в SQLite
+
+Общая основа для кэшей, которые читаются из памяти на горячем пути, а на
+диск попадают пачками из отдельного потока.
+"""
+
+import asyncio
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Открывает БД в режиме WAL без fsync на каждый коммит"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    db = sqlite3.connect(path, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    return db
+
+
+class PersistentDict:
+    """Словарь user_id → число в памяти, изменения пишутся на диск пачками"""
+
+    table = None
+    value_column = None
+    value_type = "INTEGER"
+
+    def __init__(self, path: str, flush_interval: float = 5.0):
+        self.flush_interval = flush_interval
+        self._db = connect(path)
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {self.table} ("
+            f"user_id INTEGER PRIMARY KEY, {self.value_column} {self.value_type} NOT NULL) WITHOUT ROWID"
+        )
+        self._data = dict(self._db.execute(f"SELECT user_id, {self.value_column} FROM {self.table}"))
+
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=self.table)
+        # user_id -> значение (или None, если запись нужно удалить)
+        self._dirty = {}
+        self._flusher = None
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, user_id: int):
+        return self._data.get(user_id)
+
+    def set(self, user_id: int, value):
+        if self._data.get(user_id) == value:
+            return
+        self._data[user_id] = value
+        self._mark(user_id, value)
+
+    def discard(self, user_id: int):
+        if self._data.pop(user_id, None) is not None:
+            self._mark(user_id, None)
+
+    def _mark(self, user_id: int, value):
+        self._dirty[user_id] = value
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        while self._dirty:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write_batch, batch)
+
+    def _write_batch(self, batch: dict):
+        with self._db:
+            self._db.executemany(
+                f"INSERT OR REPLACE INTO {self.table} (user_id, {self.value_column}) VALUES (?, ?)",
+                [(uid, value) for uid, value in batch.items() if value is not None]
+            )
+            self._db.executemany(
+                f"DELETE FROM {self.table} WHERE user_id = ?",
+                [(uid,) for uid, value in batch.items() if value is None]
+            )
+
+    def close(self):
+        """Синхронно дописывает изменения и закрывает БД"""
+        self._executor.shutdown(wait=True)
+        if self._dirty:
+            self._write_batch(self._dirty)
+            self._dirty = {}
+        self._db.close()
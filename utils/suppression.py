@@ -0,0 +1,47 @@
+"""
+🍑 PeachMine » Рассылка — список закрытых ЛС
+
+Кто ответил на ЛС 403 с кодом 50007 (ЛС закрыты), тот, скорее всего,
+ответит так же и в следующий раз. Таких получателей пропускаем заранее и перепроверяем только после
+истечения TTL.
+"""
+
+import time
+from array import array
+
+from .dispatcher import OUTCOME_FORBIDDEN, OUTCOME_OK
+from .store import PersistentDict
+
+
+class SuppressionList(PersistentDict):
+    """Пользователи с закрытыми ЛС и время последней проверки"""
+
+    table = "closed_dms"
+    value_column = "checked_at"
+    value_type = "REAL"
+
+    def __init__(self, path: str, ttl: float, flush_interval: float = 5.0):
+        super().__init__(path, flush_interval)
+        self.ttl = ttl
+
+    def is_suppressed(self, user_id: int, now: float = None) -> bool:
+        """True, если ЛС были закрыты и TTL на перепроверку ещё не вышел"""
+        checked_at = self._data.get(user_id)
+        if checked_at is None:
+            return False
+        return (now or time.time()) - checked_at < self.ttl
+
+    def record(self, user_id: int, outcome: str):
+        """Обновляет список по итогу отправки"""
+        if outcome == OUTCOME_FORBIDDEN:
+            self.set(user_id, time.time())
+        elif outcome == OUTCOME_OK:
+            self.discard(user_id)
+
+    def split(self, user_ids: array) -> tuple:
+        """Делит ID получателей на тех, кому пишем (array('Q')), и число пропущенных"""
+        if self.ttl <= 0 or not self._data:
+            return user_ids, 0
+        now = time.time()
+        allowed = array("Q", (uid for uid in user_ids if not self.is_suppressed(uid, now)))
+        return allowed, len(user_ids) - len(allowed)
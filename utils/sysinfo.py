@@ -0,0 +1,23 @@
+"""
+🍑 PeachMine » Рассылка — сведения о процессе
+"""
+
+import sys
+
+
+def rss_mb():
+    """Текущая резидентная память процесса в МБ (или None, если узнать нельзя)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Нет /proc — берём пик: в Linux он в КБ, в macOS в байтах
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
@@ -0,0 +1,153 @@
+"""
+🍑 PeachMine » Рассылка — REST-транспорт Discord
+
+Тонкая обёртка над aiohttp для отправки ЛС. В отличие от member.send,
+возвращает заголовки лимитов и тело ответа как есть, чтобы диспетчер
+мог сам подстраивать скорость. Базовый URL настраивается, поэтому
+транспорт можно направить на локальный фейковый сервер.
+"""
+
+import asyncio
+
+import aiohttp
+
+from .payload import dumps
+
+DEFAULT_API_BASE = "https://discord.com/api/v10"
+USER_AGENT = "DiscordBot (https://github.com/3Ve3Daa/peachmine-broadcast, 1.0)"
+
+
+class RestResponse:
+    """Ответ Discord REST API вместе с данными о лимитах"""
+
+    __slots__ = ("status", "data", "headers")
+
+    def __init__(self, status: int, data, headers: dict):
+        self.status = status
+        self.data = data
+        self.headers = headers
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    @property
+    def code(self):
+        """Код ошибки Discord (например 50007 — ЛС закрыты)"""
+        return self.data.get("code") if isinstance(self.data, dict) else None
+
+    @property
+    def remaining(self):
+        value = self.headers.get("X-RateLimit-Remaining")
+        return int(value) if value is not None else None
+
+    @property
+    def reset_after(self):
+        value = self.headers.get("X-RateLimit-Reset-After")
+        return float(value) if value is not None else None
+
+    @property
+    def retry_after(self) -> float:
+        if isinstance(self.data, dict) and "retry_after" in self.data:
+            return float(self.data["retry_after"])
+        return float(self.headers.get("Retry-After", 1.0))
+
+    @property
+    def is_global(self) -> bool:
+        if isinstance(self.data, dict) and self.data.get("global"):
+            return True
+        return self.headers.get("X-RateLimit-Global", "").lower() == "true"
+
+
+class DiscordTransport:
+    """Минимальный HTTP-клиент Discord для рассылки ЛС"""
+
+    def __init__(self, token: str, api_base: str = DEFAULT_API_BASE,
+                 timeout: float = 15.0, max_connections: int = 32, dm_channels=None):
+        self.token = token
+        # Кэш ID ЛС-каналов (DMChannelCache), чтобы не открывать ЛС перед каждой отправкой
+        self.dm_channels = dm_channels
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Сессию создаём лениво — она должна жить внутри запущенного event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.max_connections),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={
+                    "Authorization": f"Bot {self.token}",
+                    "User-Agent": USER_AGENT,
+                },
+            )
+        return self._session
+
+    async def request(self, method: str, path: str, *, payload=None,
+                      files: list = None) -> RestResponse:
+        """
+        Выполняет запрос и возвращает ответ без выбрасывания HTTP-ошибок.
+        `payload` — dict или уже сериализованное JSON-тело (bytes).
+        """
+        kwargs = {}
+        if isinstance(payload, dict):
+            payload = dumps(payload)
+        if files:
+            form = aiohttp.FormData(quote_fields=False)
+            form.add_field("payload_json", payload or b"{}",
+                           content_type="application/json")
+            for index, (name, data) in enumerate(files):
+                form.add_field(f"files[{index}]", data, filename=name,
+                               content_type="application/octet-stream")
+            kwargs["data"] = form
+        elif payload is not None:
+            kwargs["data"] = payload
+            kwargs["headers"] = {"Content-Type": "application/json"}
+
+        session = self._get_session()
+        async with session.request(method, self.api_base + path, **kwargs) as resp:
+            if resp.content_type == "application/json":
+                data = await resp.json()
+            else:
+                data = await resp.text()
+            return RestResponse(resp.status, data, resp.headers.copy())
+
+    async def create_dm(self, user_id: int) -> RestResponse:
+        return await self.request("POST", "/users/@me/channels",
+                                  payload={"recipient_id": str(user_id)})
+
+    async def send_message(self, channel_id: int, payload,
+                           files: list = None) -> RestResponse:
+        return await self.request("POST", f"/channels/{channel_id}/messages",
+                                  payload=payload, files=files)
+
+    async def open_dm(self, user_id: int) -> RestResponse:
+        """Открывает ЛС и запоминает ID канала в кэше"""
+        dm = await self.create_dm(user_id)
+        if dm.ok and self.dm_channels is not None:
+            self.dm_channels.set(user_id, int(dm.data["id"]))
+        return dm
+
+    async def send_dm(self, user_id: int, payload, files: list = None) -> RestResponse:
+        """Отправляет сообщение в ЛС, открывая канал только если его нет в кэше"""
+        channel_id = self.dm_channels.get(user_id) if self.dm_channels is not None else None
+        if channel_id is not None:
+            response = await self.send_message(channel_id, payload, files)
+            # 404 — канал из кэша больше не существует, открываем заново
+            if response.status != 404:
+                return response
+            self.dm_channels.discard(user_id)
+
+        dm = await self.open_dm(user_id)
+        if not dm.ok:
+            return dm
+        return await self.send_message(int(dm.data["id"]), payload, files)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        # Даём aiohttp закрыть SSL-соединения
+        await asyncio.sleep(0)
+